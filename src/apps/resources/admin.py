@@ -5,4 +5,5 @@ from .models import *
 
 admin.site.register(Category)
 admin.site.register(Product)
-admin.site.register(BackupProduct)
\ No newline at end of file
+admin.site.register(BackupProduct)
+admin.site.register(SyncRun)
@@ -0,0 +1,93 @@
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from .constants import AUTOCOMPLETE_LIMIT
+from .generation import CatalogueIndex
+from .models import Product
+
+
+def normalize(text):
+    """
+    Normalize a text so that the case, the accents and the spaces don't
+    matter.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    """
+    Sorted array of the normalized names of the products searched by
+    bisection.
+
+    Parameters
+    ----------
+    products : iterable
+        Identifier and name of each product. Only the first product of
+        each normalized name is kept.
+    """
+    def __init__(self, products):
+        entries = {}
+        for pk, name in products:
+            key = normalize(name)
+            if key and key not in entries:
+                entries[key] = (pk, name)
+        self.keys = sorted(entries)
+        self.ids = array("q", (entries[key][0] for key in self.keys))
+        self.names = [entries[key][1] for key in self.keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def complete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Get the products whose name starts with a prefix.
+
+        Parameters
+        ----------
+        prefix : str
+            Beginning of the name.
+        limit : int
+            Maximum number of products.
+
+        Returns
+        -------
+        : list
+            Identifier and name of the products in the alphabetical
+            order.
+        """
+        prefix = normalize(prefix)
+        products = []
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and len(products) < limit and \
+                self.keys[index].startswith(prefix):
+            products.append((self.ids[index], self.names[index]))
+            index += 1
+        return products
+
+
+class Autocomplete(CatalogueIndex):
+    """
+    Prefix index of the names of the current catalogue.
+    No product is suggested while the first index is built.
+    """
+    wait_first_build = False
+
+    def build_index(self):
+        products = Product.objects\
+            .order_by("id")\
+            .values_list("id", "product_name")\
+            .iterator(chunk_size=10000)
+        return PrefixIndex(products)
+
+    def complete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        index = self.get_index()
+        if index is None:
+            return []
+        return index.complete(prefix, limit)
+
+
+# Index of the current process.
+autocomplete = Autocomplete()
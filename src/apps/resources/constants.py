@@ -1,2 +1,64 @@
-CATEGORIES_URL = "https://fr.openfoodfacts.org/categories.json"
-PRODUCTS_URL = "https://fr.openfoodfacts.org/api/v0/product/"
+from django.conf import settings
+
+# Root of Open Food Facts, e.g. the url of a local stand-in.
+OPENFOODFACTS_URL = getattr(
+    settings, "OPENFOODFACTS_URL", "https://fr.openfoodfacts.org"
+).rstrip("/")
+CATEGORIES_URL = f"{OPENFOODFACTS_URL}/categories.json"
+PRODUCTS_URL = f"{OPENFOODFACTS_URL}/api/v0/product/"
+# Number of Open Food Facts pages downloaded at the same time.
+FETCH_WORKERS = 8
+# Timeout in seconds of a request made to Open Food Facts.
+REQUEST_TIMEOUT = 30
+# Maximum size in megabytes of the cache of Open Food Facts pages.
+CACHE_MAX_SIZE = 512
+# Number of products on a page of a category of Open Food Facts.
+PAGE_SIZE = 20
+# Number of categories and of products per category synchronised for
+# each size of catalogue.
+CATALOGUE_TIERS = {
+    "10k": (50, 200),
+    "100k": (200, 500),
+    "1m": (1000, 1000),
+}
+# Number of substitutes proposed for a product.
+SUBSTITUTES_LIMIT = 12
+# Maximum number of products whose substitutes are asked at once.
+SUBSTITUTES_BULK_MAX = 100
+# Number of saved products linked to the catalogue at once.
+SAVED_BATCH_SIZE = 1000
+# Number of product pages kept in the memory of each process and
+# seconds during which they are kept.
+PRODUCT_CACHE_SIZE = 10000
+PRODUCT_CACHE_TTL = 10 * 60
+# Text search configuration of the products: French stemming and
+# accents ignored.
+SEARCH_CONFIG = "french_unaccent"
+# Number of products on a page of search results, by default and at
+# most.
+SEARCH_PAGE_SIZE = 12
+SEARCH_MAX_PAGE_SIZE = 48
+# Seconds during which the generation of the catalogue read from the
+# database is trusted.
+GENERATION_TTL = 10
+# Number of suggestions of the autocomplete and minimum number of
+# characters typed.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MIN_LENGTH = 2
+# Seconds during which the results of a search are cached, and the
+# absence of results.
+SEARCH_CACHE_TIMEOUT = 60 * 60
+SEARCH_CACHE_MISS_TIMEOUT = 5 * 60
+# Number of results of a search kept in the cache.
+SEARCH_CACHE_RESULTS = 240
+# Cache key of the generation of the catalogue.
+GENERATION_KEY = "catalogue_generation"
+# Seconds during which a product fetched from Open Food Facts for the
+# saved products is kept, found or not.
+EXTERNAL_CACHE_TTL = 24 * 60 * 60
+# Number of products fetched at the same time for the saved products,
+# timeouts in seconds to connect and to read each one and seconds
+# after which the products not fetched yet are left out.
+EXTERNAL_WORKERS = 8
+EXTERNAL_TIMEOUT = (2, 3)
+EXTERNAL_DEADLINE = 5
@@ -0,0 +1,9 @@
+from .constants import AUTOCOMPLETE_MIN_LENGTH
+
+
+def autocomplete(request):
+    """
+    Add the minimum length of the text suggested by the autocomplete
+    to the context of the templates.
+    """
+    return {"autocomplete_min_length": AUTOCOMPLETE_MIN_LENGTH}
@@ -0,0 +1,136 @@
+import csv
+import gzip
+import io
+import json
+import sys
+
+# Thresholds in g/100g used by Open Food Facts to compute the nutrient
+# levels: (nutrient, CSV column, upper bound of "low", upper bound of
+# "moderate").
+NUTRIENT_LEVELS = (
+    ("fat", "fat_100g", 3, 20),
+    ("saturated-fat", "saturated-fat_100g", 1.5, 5),
+    ("sugars", "sugars_100g", 5, 12.5),
+    ("salt", "salt_100g", 0.3, 1.5),
+)
+NUTRITION_GRADES = ("a", "b", "c", "d", "e")
+
+
+def open_dump(path):
+    """
+    Open an Open Food Facts export as a text stream.
+
+    Parameters
+    ----------
+    path : str
+        Path of the export, gzip compressed if it ends with ".gz".
+
+    Returns
+    -------
+    : io.TextIOBase
+        Stream of the export.
+    """
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def nutrient_level(value, low, moderate):
+    """
+    Get the level of a nutrient from its quantity.
+
+    Parameters
+    ----------
+    value : str
+        Quantity of the nutrient in g/100g.
+    low : float
+        Upper bound of the "low" level.
+    moderate : float
+        Upper bound of the "moderate" level.
+
+    Returns
+    -------
+    : str
+        "low", "moderate", "high" or None if the quantity is unknown.
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value <= low:
+        return "low"
+    if value <= moderate:
+        return "moderate"
+    return "high"
+
+
+def read_jsonl(stream):
+    """
+    Read the products of a JSONL export, one product per line.
+    """
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    """
+    Read the products of a CSV export.
+    The columns are tab separated in the official export but comma
+    separated files are also accepted.
+    """
+    header = stream.readline()
+    delimiter = "\t" if "\t" in header else ","
+    fieldnames = next(csv.reader([header], delimiter=delimiter))
+    # Some fields of the official export are bigger than the default
+    # limit of the csv module.
+    csv.field_size_limit(sys.maxsize)
+    reader = csv.DictReader(
+        stream, fieldnames=fieldnames, delimiter=delimiter,
+        quoting=csv.QUOTE_NONE if delimiter == "\t" else csv.QUOTE_MINIMAL
+    )
+    for row in reader:
+        row["nutrient_levels"] = {
+            nutrient: nutrient_level(row.get(column), low, moderate)
+            for nutrient, column, low, moderate in NUTRIENT_LEVELS
+        }
+        row["nutrition_grades"] = (
+            row.get("nutriscore_grade") or row.get("nutrition_grade_fr")
+        )
+        yield row
+
+
+def read_dump(path):
+    """
+    Stream the products of an Open Food Facts export.
+    Only one product is held in memory at a time so that the size of
+    the export doesn't matter.
+
+    Parameters
+    ----------
+    path : str
+        Path of a JSONL or CSV export, optionally gzip compressed.
+
+    Yields
+    ------
+    category_name, product : tuple
+        Name of the category of the product and the product in the
+        same format as the one returned by the Open Food Facts API.
+    """
+    with open_dump(path) as stream:
+        name = path[:-3] if path.endswith(".gz") else path
+        if name.endswith((".csv", ".tsv")):
+            products = read_csv(stream)
+        else:
+            products = read_jsonl(stream)
+        for p in products:
+            # The first category is the most generic one.
+            category_name = (p.get("categories") or "").split(",")[0].strip()
+            grade = (
+                p.get("nutrition_grades") or p.get("nutriscore_grade") or ""
+            ).lower()
+            if not category_name or grade not in NUTRITION_GRADES:
+                continue
+            p["nutrition_grades"] = grade
+            p["nutrient_levels"] = p.get("nutrient_levels") or {}
+            yield category_name, p
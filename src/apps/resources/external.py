@@ -0,0 +1,131 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import (
+    EXTERNAL_CACHE_TTL, EXTERNAL_DEADLINE, EXTERNAL_TIMEOUT, EXTERNAL_WORKERS,
+    PRODUCTS_URL
+)
+from .models import ExternalProductCache
+
+# Session shared by the threads of the process, keeping one open
+# connection per thread.
+session = requests.Session()
+adapter = HTTPAdapter(
+    pool_connections=EXTERNAL_WORKERS, pool_maxsize=EXTERNAL_WORKERS
+)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+
+
+def fetch_product(code):
+    """
+    Fetch a product from Open Food Facts.
+
+    Parameters
+    ----------
+    code : str
+        Code of the product.
+
+    Returns
+    -------
+    : dict
+        Fields of the product shown in the saved products, None if
+        Open Food Facts doesn't know the product.
+
+    Raises
+    ------
+        requests.RequestException : If the request failed.
+        ValueError : If the response isn't JSON.
+    """
+    response = session.get(
+        f"{PRODUCTS_URL}{code}.json", timeout=EXTERNAL_TIMEOUT
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    product = response.json().get("product")
+    if not product:
+        return None
+    levels = product.get("nutrient_levels") or {}
+    return {
+        "product_name": product.get("product_name"),
+        "img_url": product.get("image_url"),
+        "url": product.get("url"),
+        "salt": levels.get("salt"),
+        "fat": levels.get("fat"),
+        "sugars": levels.get("sugars"),
+        "saturated_fat": levels.get("saturated-fat"),
+        "warehouse": product.get("brands"),
+        "allergens": product.get("allergens"),
+        "nutrition_grades": product.get("nutrition_grades"),
+    }
+
+
+def external_products(codes):
+    """
+    Get products from Open Food Facts, through a cache shared by the
+    processes: a product is fetched at most once every
+    EXTERNAL_CACHE_TTL seconds. The products missing from the cache are
+    fetched at the same time and the ones which failed or didn't arrive
+    within EXTERNAL_DEADLINE seconds are left out.
+
+    Parameters
+    ----------
+    codes : list
+        Codes of the products.
+
+    Returns
+    -------
+    : dict
+        Fields of each product found.
+    """
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return {}
+    now = timezone.now()
+    cached = {
+        entry.code: entry.data
+        for entry in ExternalProductCache.objects.filter(
+            code__in=codes,
+            fetched_at__gt=now - timedelta(seconds=EXTERNAL_CACHE_TTL)
+        )
+    }
+    missing = [code for code in codes if code not in cached]
+    if missing:
+        executor = ThreadPoolExecutor(
+            max_workers=min(EXTERNAL_WORKERS, len(missing))
+        )
+        futures = {executor.submit(fetch_product, c): c for c in missing}
+        done, _ = wait(futures, timeout=EXTERNAL_DEADLINE)
+        # The late requests end on their own timeouts.
+        executor.shutdown(wait=False)
+        fetched = {}
+        for future in done:
+            try:
+                data = future.result()
+            except (requests.RequestException, ValueError):
+                # Retried by the next request.
+                continue
+            fetched[futures[future]] = None if data is None \
+                else json.dumps(data)
+        with transaction.atomic():
+            ExternalProductCache.objects.filter(code__in=fetched).delete()
+            ExternalProductCache.objects.bulk_create(
+                [
+                    ExternalProductCache(code=code, data=data, fetched_at=now)
+                    for code, data in fetched.items()
+                ],
+                ignore_conflicts=True
+            )
+        cached.update(fetched)
+    return {
+        code: json.loads(data) for code, data in cached.items()
+        if data is not None
+    }
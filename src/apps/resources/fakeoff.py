@@ -0,0 +1,275 @@
+import hashlib
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from math import ceil
+
+from .constants import PAGE_SIZE
+
+NUTRIENTS = ("fat", "saturated-fat", "sugars", "salt")
+LEVELS = ("low", "moderate", "high")
+CATEGORY_PAGE = re.compile(r"^/categorie/category-(\d+)/(\d+)\.json$")
+PRODUCT_PAGE = re.compile(r"^/api/v0/product/(\d+)\.json$")
+
+
+class FakeCatalogue:
+    """
+    Synthetic catalogue served by the stand-in of Open Food Facts.
+
+    The products are generated from their position so any page can be
+    served without holding the catalogue in memory, and the same seed
+    always gives the same catalogue.
+
+    Parameters
+    ----------
+    categories : int
+        Number of categories.
+    products : int
+        Number of products per category.
+    seed : int
+        Seed of the generated values.
+    """
+    def __init__(self, categories, products, seed=0):
+        self.categories = categories
+        self.products = products
+        self.seed = seed
+
+    def code(self, category, index):
+        """
+        Get the barcode of a product from its position.
+        """
+        return f"{category + 1:04}{index:09}"
+
+    def position(self, code):
+        """
+        Get the position of a product from its barcode.
+
+        Returns
+        -------
+        category, index : tuple
+            Position of the product or None if the code isn't in the
+            catalogue.
+        """
+        if len(code) != 13:
+            return None
+        category, index = int(code[:4]) - 1, int(code[4:])
+        if 0 <= category < self.categories and 0 <= index < self.products:
+            return category, index
+        return None
+
+    def category(self, category, base_url):
+        return {
+            "id": f"fr:category-{category}",
+            "name": f"Catégorie {category}",
+            "url": f"{base_url}/categorie/category-{category}",
+            "products": self.products,
+        }
+
+    def product(self, category, index, base_url):
+        """
+        Generate a product in the format of the Open Food Facts API.
+        """
+        code = self.code(category, index)
+        rand = random.Random(f"{self.seed}-{code}")
+        return {
+            "code": code,
+            "product_name": f"Produit {category}-{index}",
+            "brands": f"Marque {rand.randrange(100)}",
+            "categories": f"Catégorie {category}",
+            "image_url": f"{base_url}/images/{code}.jpg",
+            "url": f"{base_url}/produit/{code}",
+            "allergens": rand.choice(("", "en:milk", "en:nuts")),
+            "nutrient_levels": {
+                nutrient: rand.choice(LEVELS) for nutrient in NUTRIENTS
+            },
+            "nutrition_grades": rand.choice("abcde"),
+        }
+
+    def categories_page(self, base_url):
+        return {
+            "count": self.categories,
+            "tags": [
+                self.category(category, base_url)
+                for category in range(self.categories)
+            ],
+        }
+
+    def category_page(self, category, page, base_url):
+        """
+        Get a page of the products of a category.
+
+        Returns
+        -------
+        : dict
+            Content of the page or None if the category doesn't exist.
+        """
+        if not 0 <= category < self.categories:
+            return None
+        start = (page - 1) * PAGE_SIZE
+        return {
+            "count": self.products,
+            "page": page,
+            "page_count": ceil(self.products / PAGE_SIZE),
+            "page_size": PAGE_SIZE,
+            "products": [
+                self.product(category, index, base_url)
+                for index in range(max(start, 0),
+                                   min(start + PAGE_SIZE, self.products))
+            ],
+        }
+
+    def product_page(self, code, base_url):
+        position = self.position(code)
+        if position is None:
+            return None
+        return {
+            "code": code,
+            "status": 1,
+            "status_verbose": "product found",
+            "product": self.product(*position, base_url),
+        }
+
+
+class FakeOpenFoodFactsHandler(BaseHTTPRequestHandler):
+    """
+    Answer the requests made to the stand-in of Open Food Facts.
+    """
+    def do_GET(self):
+        server = self.server
+        server.count()
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.random.random() < server.error_rate:
+            return self.respond(503, {"error": "Service unavailable"})
+        path = self.path.split("?")[0]
+        catalogue, base_url = server.catalogue, server.url
+        category = CATEGORY_PAGE.match(path)
+        product = PRODUCT_PAGE.match(path)
+        if path == "/categories.json":
+            content = catalogue.categories_page(base_url)
+        elif category:
+            content = catalogue.category_page(
+                int(category.group(1)), int(category.group(2)), base_url
+            )
+        elif product:
+            content = catalogue.product_page(product.group(1), base_url)
+            if content is None:
+                content = {
+                    "code": product.group(1),
+                    "status": 0,
+                    "status_verbose": "product not found",
+                }
+                return self.respond(404, content)
+        else:
+            content = None
+        if content is None:
+            return self.respond(404, {"error": "Not found"})
+        self.respond(200, content)
+
+    def respond(self, status, content):
+        body = json.dumps(content).encode("utf-8")
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    HTTP server answering each request in its own thread, which
+    http.server only provides from Python 3.7.
+    """
+    daemon_threads = True
+
+
+class FakeOpenFoodFacts(ThreadingHTTPServer):
+    """
+    Local stand-in of Open Food Facts serving a synthetic catalogue.
+
+    It answers the categories list, the pages of products of each
+    category and the product API, with an optional latency and error
+    rate, so that the synchronisation and the fallback to the API can
+    be measured without network access. It can be run in a thread, e.g.
+    by the tests:
+
+        with FakeOpenFoodFacts(FakeCatalogue(20, 200)) as server:
+            requests.get(f"{server.url}/categories.json")
+
+    Parameters
+    ----------
+    catalogue : FakeCatalogue
+        Catalogue served.
+    host : str
+        Address the server listens on.
+    port : int
+        Port the server listens on, a free port is chosen if 0.
+    latency : float
+        Delay in seconds added to each response.
+    error_rate : float
+        Fraction of the requests answered by a 503 error.
+    verbose : bool
+        Log each request on the standard error.
+    """
+    daemon_threads = True
+
+    def __init__(self, catalogue, host="127.0.0.1", port=0, latency=0,
+                 error_rate=0, verbose=False):
+        super().__init__((host, port), FakeOpenFoodFactsHandler)
+        self.catalogue = catalogue
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.random = random.Random(catalogue.seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+
+    def start(self):
+        """
+        Serve the requests in a background thread.
+        """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the background thread and close the server.
+        """
+        if self.thread is not None:
+            self.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
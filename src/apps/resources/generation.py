@@ -0,0 +1,146 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+
+from .constants import GENERATION_KEY, GENERATION_TTL
+from .models import SyncRun
+
+lock = threading.Lock()
+# Last generation read from the database and when it was read.
+state = {"generation": None, "checked_at": 0}
+
+
+def catalogue_generation():
+    """
+    Get the generation of the catalogue.
+    The generation is the identifier of the last successful
+    synchronisation, so it changes each time `sync_database` publishes
+    a catalogue. It is read from the cache, or from the database when
+    the cache doesn't have it, at most every GENERATION_TTL seconds by
+    each process.
+
+    Returns
+    -------
+    : int
+        Generation of the catalogue, 0 before the first
+        synchronisation.
+    """
+    now = time.monotonic()
+    with lock:
+        if state["generation"] is not None and \
+                now - state["checked_at"] < GENERATION_TTL:
+            return state["generation"]
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = SyncRun.objects\
+            .filter(status=SyncRun.DONE)\
+            .order_by("-id")\
+            .values_list("id", flat=True)\
+            .first() or 0
+        cache.set(GENERATION_KEY, generation, GENERATION_TTL)
+    with lock:
+        state["generation"], state["checked_at"] = generation, now
+    return generation
+
+
+def expire_generation():
+    """
+    Read the generation from the database on the next call of
+    `catalogue_generation`.
+    """
+    with lock:
+        state["generation"] = None
+
+
+def publish_generation(generation):
+    """
+    Make a new generation of the catalogue the current one.
+    The processes sharing the cache read it without waiting for the
+    generation they read from the database to expire.
+
+    Parameters
+    ----------
+    generation : int
+        Identifier of the synchronisation which published the
+        catalogue.
+    """
+    cache.set(GENERATION_KEY, generation, GENERATION_TTL)
+    expire_generation()
+
+
+class CatalogueIndex:
+    """
+    Index of the current catalogue kept in memory by each process.
+
+    The index is built on first use, then rebuilt when the generation
+    of the catalogue changes. While it is rebuilt the previous index
+    keeps answering. Subclasses build the index in `build_index`, and
+    set `wait_first_build` to False to build the first index in the
+    background too, `get_index` returning None until it is built.
+
+    Parameters
+    ----------
+    background : bool
+        Rebuild the index in a background thread rather than during
+        the request which notices the new generation.
+    """
+    wait_first_build = True
+
+    def __init__(self, background=True):
+        self.background = background
+        self.index = None
+        self.generation = None
+        self.rebuilding = False
+        self.lock = threading.Lock()
+
+    def build_index(self):
+        """
+        Build the index of the catalogue stored in the database.
+        """
+        raise NotImplementedError
+
+    def build(self, generation):
+        """
+        Build the index of the catalogue of a generation.
+        """
+        self.index, self.generation = self.build_index(), generation
+
+    def rebuild(self, generation):
+        try:
+            self.build(generation)
+        finally:
+            self.rebuilding = False
+            if self.background:
+                # Close the connection opened by the thread.
+                connections.close_all()
+
+    def get_index(self):
+        """
+        Get the index of the current catalogue.
+
+        Returns
+        -------
+        : object
+            Index, possibly of the previous generation while the index
+            of the current one is built.
+        """
+        generation = catalogue_generation()
+        if self.index is None and (
+                self.wait_first_build or not self.background):
+            with self.lock:
+                if self.index is None:
+                    self.build(generation)
+        elif generation != self.generation:
+            with self.lock:
+                if self.rebuilding or generation == self.generation:
+                    return self.index
+                if not self.background:
+                    self.build(generation)
+                    return self.index
+                self.rebuilding = True
+            threading.Thread(
+                target=self.rebuild, args=(generation,), daemon=True
+            ).start()
+        return self.index
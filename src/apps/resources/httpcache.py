@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    On-disk cache of HTTP responses used to make conditional requests.
+
+    Each response is stored in a file named after the hash of its url
+    with its ETag and Last-Modified headers. When the cache gets bigger
+    than its maximum size, the least recently used responses are
+    deleted.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the cache, created if needed.
+    max_size : int
+        Maximum size of the cache in bytes.
+    """
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def files(self):
+        """
+        Get the files of the cache.
+
+        Returns
+        -------
+        : list
+            Path, size and last use of each file.
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def get(self, url):
+        """
+        Get the cached response of an url.
+
+        Parameters
+        ----------
+        url : str
+            Url of the response.
+
+        Returns
+        -------
+        : dict
+            Body, ETag, Last-Modified and storage timestamp of the
+            response or None if the url isn't cached.
+        """
+        path = self.path(url)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            # The modification time is the last use of the response.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def set(self, url, body, etag=None, last_modified=None):
+        """
+        Store the response of an url.
+
+        Parameters
+        ----------
+        url : str
+            Url of the response.
+        body : str
+            Body of the response.
+        etag : str
+            ETag header of the response.
+        last_modified : str
+            Last-Modified header of the response.
+        """
+        path = self.path(url)
+        data = json.dumps({
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+            "body": body
+        }).encode("utf-8")
+        if len(data) > self.max_size:
+            return
+        # Write in a temporary file first so that a reader never gets a
+        # partial response.
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(data)
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.files())
+            try:
+                self.size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(temporary, path)
+            self.size += len(data)
+            if self.size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        """
+        Delete the least recently used responses until the cache fits in
+        its maximum size.
+        """
+        files = sorted(self.files(), key=lambda f: f[2])
+        self.size = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def headers(self, entry):
+        """
+        Get the headers of a conditional request for a cached response.
+        """
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
@@ -0,0 +1,139 @@
+from itertools import islice
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import Product
+
+# Number of products held in memory before being sent to the database.
+BATCH_SIZE = 5000
+# Size in bytes of the chunks sent to PostgreSQL during a COPY.
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class CopyStream:
+    """
+    File-like object encoding rows in the CSV format of COPY on the fly.
+
+    Parameters
+    ----------
+    rows : iterable
+        Values of each row.
+    """
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = ""
+
+    @staticmethod
+    def encode(row):
+        """
+        Encode a row, None values are NULL.
+        """
+        return ",".join(
+            "" if value is None
+            else '"{}"'.format(str(value).replace('"', '""'))
+            for value in row
+        ) + "\n"
+
+    def read(self, size=COPY_CHUNK_SIZE):
+        """
+        Read at least `size` characters unless all rows have been read.
+        """
+        size = size if size > 0 else COPY_CHUNK_SIZE
+        chunks, length = [self.buffer], len(self.buffer)
+        for row in self.rows:
+            line = self.encode(row)
+            chunks.append(line)
+            length += len(line)
+            if length >= size:
+                break
+        data = "".join(chunks)
+        self.buffer = data[size:]
+        return data[:size]
+
+
+def product_columns():
+    """
+    Get the fields written by the loaders.
+
+    Returns
+    -------
+    : list
+        Concrete fields of a product except its primary key and the
+        fields computed by the database.
+    """
+    return [
+        f for f in Product._meta.concrete_fields
+        if not f.primary_key and f.editable
+    ]
+
+
+def copy_products(products, connection, table=None):
+    """
+    Insert products with a COPY FROM STDIN statement.
+
+    Parameters
+    ----------
+    products : list
+        Unsaved products.
+    connection : DatabaseWrapper
+        PostgreSQL connection.
+    table : str
+        Table filled, by default the table of the product model.
+    """
+    fields = product_columns()
+    quote = connection.ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        quote(table or Product._meta.db_table),
+        ", ".join(quote(f.column) for f in fields)
+    )
+    rows = (
+        [
+            f.get_db_prep_save(getattr(p, f.attname), connection)
+            for f in fields
+        ]
+        for p in products
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, CopyStream(rows), COPY_CHUNK_SIZE)
+
+
+def load_products(products, batch_size=BATCH_SIZE, using=DEFAULT_DB_ALIAS,
+                  table=None):
+    """
+    Insert products into the database by batch.
+    On PostgreSQL each batch is streamed with COPY, other databases
+    fall back on bulk_create. Only one batch is held in memory at a
+    time, products can be produced lazily by a generator.
+
+    Parameters
+    ----------
+    products : iterable
+        Unsaved products.
+    batch_size : int
+        Number of products inserted at a time.
+    using : str
+        Alias of the database.
+    table : str
+        Table filled instead of the table of the product model, only
+        supported on PostgreSQL.
+
+    Returns
+    -------
+    total : int
+        Number of products inserted.
+    """
+    connection = connections[using]
+    if table is not None and connection.vendor != "postgresql":
+        raise ValueError("Loading another table requires PostgreSQL.")
+    products = iter(products)
+    total = 0
+    while True:
+        batch = list(islice(products, batch_size))
+        if not batch:
+            return total
+        with transaction.atomic(using=using):
+            if connection.vendor == "postgresql":
+                copy_products(batch, connection, table)
+            else:
+                Product.objects.using(using).bulk_create(batch)
+        total += len(batch)
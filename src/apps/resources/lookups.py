@@ -0,0 +1,32 @@
+from django.contrib.postgres.lookups import PostgresSimpleLookup
+from django.db.models import CharField, FloatField, Func, Value
+
+
+@CharField.register_lookup
+class TrigramWordSimilar(PostgresSimpleLookup):
+    """
+    Match the values containing a word similar to the searched words,
+    using the `%>` operator of pg_trgm which a trigram index can serve.
+    """
+    lookup_name = "trigram_word_similar"
+    operator = "%%>"
+
+
+class TrigramWordSimilarity(Func):
+    """
+    Similarity between words and the most similar part of a value.
+
+    Parameters
+    ----------
+    string : str
+        Words searched.
+    expression : str
+        Field or expression compared to the words.
+    """
+    function = "word_similarity"
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, "resolve_expression"):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.resources.constants import CATALOGUE_TIERS
+from apps.resources.fakeoff import FakeCatalogue, FakeOpenFoodFacts
+
+
+class Command(BaseCommand):
+    help = "Serve a synthetic catalogue in place of Open Food Facts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--categories",
+            type=int,
+            default=settings.SYNC_MAX_CATEGORIES,
+            help="Number of categories served."
+        )
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=settings.SYNC_MAX_PRODUCTS,
+            help="Number of products per category."
+        )
+        parser.add_argument(
+            "--tier",
+            choices=sorted(CATALOGUE_TIERS),
+            help=(
+                "Serve a catalogue of this size, overriding --categories "
+                "and --products."
+            )
+        )
+        parser.add_argument(
+            "--latency",
+            type=int,
+            default=0,
+            metavar="MS",
+            help="Delay added to each response in milliseconds."
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Fraction of the requests answered by a 503 error."
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the generated catalogue."
+        )
+
+    def handle(self, *args, **options):
+        """
+        Serve the catalogue until the command is interrupted.
+        """
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1.")
+        if options["tier"]:
+            categories, products = CATALOGUE_TIERS[options["tier"]]
+        else:
+            categories, products = options["categories"], options["products"]
+        server = FakeOpenFoodFacts(
+            FakeCatalogue(categories, products, seed=options["seed"]),
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"] / 1000,
+            error_rate=options["error_rate"],
+            verbose=options["verbosity"] > 1
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Open Food Facts factice sur {server.url}: {categories} "
+                f"catégorie(s) de {products} produit(s)."
+            )
+        )
+        self.stdout.write(f"Utiliser OPENFOODFACTS_URL={server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"{server.requests} requête(s) servie(s).")
@@ -1,20 +1,234 @@
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from itertools import islice
 from math import ceil
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand, CommandError, OutputWrapper
+)
+from django.db import DatabaseError, connection, connections, transaction
+from django.utils import timezone
 
-from apps.resources.constants import CATEGORIES_URL
-from apps.resources.models import Category, Product
+from apps.resources.constants import (
+    CACHE_MAX_SIZE, CATALOGUE_TIERS, CATEGORIES_URL, FETCH_WORKERS,
+    PAGE_SIZE, REQUEST_TIMEOUT
+)
+from apps.resources.dumps import read_dump
+from apps.resources.generation import publish_generation
+from apps.resources.httpcache import ResponseCache
+from apps.resources.loaders import load_products
+from apps.resources.models import (
+    BackupProduct, Category, Product, ProductSubstitute, SyncRun
+)
+from apps.resources.saved import link_saved_products
+from apps.resources.scoring import score_catalogue
+from apps.resources.staging import StagingCatalogue
+from apps.resources.substitutes import refresh_all_substitutes
+
+# Product fields filled from Open Food Facts.
+PRODUCT_FIELDS = (
+    "product_name", "img_url", "url", "salt", "fat", "sugars",
+    "saturated_fat", "warehouse", "allergens", "nutrition_grades"
+)
+# Maximum number of rows written by a single query.
+BATCH_SIZE = 1000
 
 
 class Command(BaseCommand):
     help = "Adding data to the database."
+    cache = None
     category = None
+    # Identifiers of the categories whose products an incremental
+    # synchronisation changed.
+    changed_categories = frozenset()
+    # Number of pages or categories which couldn't be synchronised.
+    errors = 0
+    known_categories = ()
+    run = None
+    session = None
+    synced_at = 0
+    staging = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Only apply the changes since the last synchronisation "
+                "instead of reloading the whole catalogue."
+            )
+        )
+        parser.add_argument(
+            "--from-file",
+            metavar="PATH",
+            help=(
+                "Reload the catalogue from an Open Food Facts export "
+                "(JSONL or CSV, optionally gzip compressed) instead of "
+                "the API."
+            )
+        )
+        parser.add_argument(
+            "--swap",
+            action="store_true",
+            help=(
+                "Load the new catalogue aside and publish it at once, the "
+                "site keeps serving the current catalogue meanwhile."
+            )
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help=(
+                "Resume the last synchronisation which didn't finish from "
+                "its last synchronised page."
+            )
+        )
+        parser.add_argument(
+            "--cache-dir",
+            metavar="PATH",
+            help=(
+                "Keep the downloaded pages in this directory and only "
+                "download them again if they have been modified. With "
+                "--incremental, unmodified categories are skipped."
+            )
+        )
+        parser.add_argument(
+            "--cache-size",
+            type=int,
+            default=CACHE_MAX_SIZE,
+            metavar="MB",
+            help="Maximum size of the cache in megabytes."
+        )
+        parser.add_argument(
+            "--fetch-workers",
+            type=int,
+            default=FETCH_WORKERS,
+            help="Number of pages downloaded at the same time."
+        )
+        parser.add_argument(
+            "--max-categories",
+            type=int,
+            default=settings.SYNC_MAX_CATEGORIES,
+            help="Number of categories synchronised."
+        )
+        parser.add_argument(
+            "--max-products",
+            type=int,
+            default=settings.SYNC_MAX_PRODUCTS,
+            help="Maximum number of products synchronised per category."
+        )
+        parser.add_argument(
+            "--tier",
+            choices=sorted(CATALOGUE_TIERS),
+            help=(
+                "Synchronise a catalogue of this size, overriding "
+                "--max-categories and --max-products: {}.".format(", ".join(
+                    f"{name} ({categories} categories of {products} "
+                    f"products)"
+                    for name, (categories, products)
+                    in sorted(CATALOGUE_TIERS.items())
+                ))
+            )
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Number of processes synchronising the categories at the "
+                "same time, each one with its own database connection."
+            )
+        )
 
-    def insert_products(self, product_number, url):
+    def download(self, url):
         """
-        Insert all products off each category into the database.
+        Download a page of Open Food Facts.
+        If the response cache is enabled, the request is conditional and
+        the cached page is used when it hasn't been modified.
+        Parameters
+        ----------
+        url : string
+            Page url.
+
+        Returns
+        -------
+        body, changed : tuple
+            Content of the page and False if the page is the same as
+            during the last successful synchronisation.
+        """
+        entry = self.cache.get(url) if self.cache is not None else None
+        headers = self.cache.headers(entry) if entry else {}
+        response = self.session.get(
+            url, headers=headers, timeout=REQUEST_TIMEOUT
+        )
+        if entry and response.status_code == 304:
+            # The page may have been cached by a synchronisation which
+            # failed before writing it.
+            return entry["body"], entry["stored_at"] > self.synced_at
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self.cache is not None and (etag or last_modified):
+            self.cache.set(url, response.text, etag, last_modified)
+        return response.text, True
+
+    def prefetch(self, executor, urls, window):
+        """
+        Download pages in the background, at most `window` pages ahead
+        of the one being read, so the memory usage doesn't depend on
+        the number of pages.
+        Parameters
+        ----------
+        executor : ThreadPoolExecutor
+            Threads downloading the pages.
+        urls : iterable
+            Url of each page.
+        window : int
+            Maximum number of pages downloaded or waiting to be read.
+
+        Returns
+        -------
+        : generator
+            Result of `download` for each page, in the order of the
+            urls.
+        """
+        urls = iter(urls)
+        pending = deque(
+            executor.submit(self.download, url)
+            for url in islice(urls, window)
+        )
+        while pending:
+            page = pending.popleft().result()
+            for url in islice(urls, 1):
+                pending.append(executor.submit(self.download, url))
+            yield page
+
+    def fetch_page(self, url):
+        """
+        Download and decode a page of Open Food Facts.
+        Parameters
+        ----------
+        url : string
+            Page url.
+
+        Returns
+        -------
+        : dict
+            Decoded JSON content of the page.
+        """
+        return json.loads(self.download(url)[0])
+
+    def get_page_urls(self, product_number, url):
+        """
+        Get the url of each page of a category.
         Parameters
         ----------
         product_number : string
@@ -22,59 +236,257 @@ class Command(BaseCommand):
         url : string
             Category url.
 
+        Returns
+        -------
+        : list
+            Url of each page to download.
+        """
+        total_page = ceil(product_number / PAGE_SIZE)
+        return [f'{url}/{page}.json' for page in range(1, total_page + 1)]
+
+    def decode_pages(self, pages, max_products, first_page=1):
+        """
+        Decode the pages of a category, the last one being cut to the
+        number of products synchronised.
+        Parameters
+        ----------
+        pages : iterable
+            Content of each page and whether it changed since the last
+            successful synchronisation.
+        max_products : int
+            Number of products synchronised in the category.
+        first_page : int
+            Number of the first page.
+
+        Returns
+        -------
+        : generator
+            Decoded JSON content of each page.
+        """
+        for number, (body, _) in enumerate(pages, start=first_page):
+            page = json.loads(body)
+            page["products"] = page["products"][
+                :max(0, max_products - (number - 1) * PAGE_SIZE)
+            ]
+            yield page
+
+    def build_product(self, p, category):
+        """
+        Build a product from its Open Food Facts data.
+        Parameters
+        ----------
+        p : dict
+            Product as returned by Open Food Facts.
+        category : Category
+            Category of the product.
+
+        Returns
+        -------
+        : Product
+            Unsaved product or None if the product is incomplete.
+        """
+        if not (p.get("product_name") and
+                p.get("nutrition_grades") and p.get("code")):
+            return None
+        product = Product(
+            product_name=p.get("product_name"),
+            code=p.get("code"),
+            img_url=p.get("image_url"),
+            url=p.get("url"),
+            salt=p["nutrient_levels"].get("salt"),
+            fat=p["nutrient_levels"].get("fat"),
+            sugars=p["nutrient_levels"].get("sugars"),
+            saturated_fat=p["nutrient_levels"].get("saturated-fat"),
+            warehouse=p.get("brands"),
+            allergens=p.get("allergens"),
+            nutrition_grades=p.get("nutrition_grades"),
+            category=category
+        )
+        # Cut the values too long for their column.
+        for field in ("code",) + PRODUCT_FIELDS:
+            value = getattr(product, field)
+            max_length = Product._meta.get_field(field).max_length
+            if value and len(value) > max_length:
+                setattr(product, field, value[:max_length])
+        return product
+
+    def build_products(self, pages):
+        """
+        Build the products of a category from its pages.
+        Parameters
+        ----------
+        pages : list
+            Decoded JSON content of each page of the category.
+
+        Returns
+        -------
+        products : list
+            Unsaved products of the category.
+        """
+        products = list()
+        for response in pages:
+            for p in response["products"]:
+                product = self.build_product(p, self.category)
+                if product is not None:
+                    products.append(product)
+        return products
+
+    def insert_products(self, pages, first_page=1):
+        """
+        Insert all products off each category into the database.
+        Each page is inserted in its own transaction with the checkpoint
+        of the synchronisation, so an interrupted synchronisation can be
+        resumed from the last inserted page. The category stops at the
+        first page which can't be inserted, the checkpoint stays on the
+        page before it.
+        Parameters
+        ----------
+        pages : iterable
+            Decoded JSON content of each page of the category.
+        first_page : int
+            Number of the first page.
+
         Raises
         ------
             Exception : If there is any error during the product
             insertion.
         """
-        total_page = ceil(product_number / 20)
-        # Limit to 200 products per category.
-        if total_page > 10:
-            total_page = 11
+        total_page, total_product = 0, 0
         # Browse all pages of a category.
-        products = list()
-        for page in range(1, total_page):
-            response = requests.get(f'{url}/{page}.json').json()
-            # Add all products into a huge list.
-            products += [
-                Product(
-                    product_name=p.get("product_name"),
-                    code=p.get("code"),
-                    img_url=p.get("image_url"),
-                    url=p.get("url"),
-                    salt=p["nutrient_levels"].get("salt"),
-                    fat=p["nutrient_levels"].get("fat"),
-                    sugars=p["nutrient_levels"].get("sugars"),
-                    saturated_fat=p["nutrient_levels"].get("saturated-fat"),
-                    warehouse=p.get("brands"),
-                    allergens=p.get("allergens"),
-                    nutrition_grades=p.get("nutrition_grades"),
-                    category=self.category
+        for number, page in enumerate(pages, start=first_page):
+            products = self.build_products([page])
+            # Insert the products of the page into 'Product' table.
+            try:
+                with transaction.atomic():
+                    self.load_products(products)
+                    self.checkpoint(page=number)
+            except Exception as e:
+                self.errors += 1
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"Error during product insertion:\n{e}\n"
+                    )
                 )
-                for p in response["products"]
-                if (p.get("product_name") and
-                    p.get("nutrition_grades") and p.get("code"))
-            ]
+                break
+            total_page += 1
+            total_product += len(products)
+        self.stdout.write(f'ID #{self.category.id}.')
+        self.stdout.write(f'{total_page} page(s) synchronisée(s).')
+        self.stdout.write(f'{total_product} produit(s) synchronisé(s).')
+
+    def upsert_products(self, pages, category_index):
+        """
+        Apply the difference between the pages of a category and its
+        products stored into the database.
+        Products are matched on their code, only new products are
+        inserted, only modified products are updated and products
+        which are no longer in the pages are deleted.
+        Parameters
+        ----------
+        pages : list
+            Decoded JSON content of each page of the category.
+        category_index : int
+            Position of the category in the synchronisation.
+
+        Raises
+        ------
+            Exception : If there is any error during the product
+            synchronisation.
+        """
+        # The last occurrence of a code wins if a product is on two
+        # pages.
+        products = {p.code: p for p in self.build_products(pages)}
+        stored = Product.objects\
+            .filter(category=self.category)\
+            .order_by("id")\
+            .values_list("id", "code", *PRODUCT_FIELDS)
+        to_update, to_delete, seen = [], [], set()
+        for row in stored:
+            pk, code, values = row[0], row[1], row[2:]
+            product = products.get(code)
+            if product is None or code in seen:
+                to_delete.append(pk)
+                continue
+            seen.add(code)
+            if values != tuple(getattr(product, f) for f in PRODUCT_FIELDS):
+                product.pk = pk
+                to_update.append(product)
+        to_create = [p for code, p in products.items() if code not in seen]
         self.stdout.write(f'ID #{self.category.id}.')
-        self.stdout.write(f'{page} page(s) synchronisée(s).')
-        self.stdout.write(f'{len(products)} produit(s) synchronisé(s).')
-        # Insert all the products for a category into 'Product' table.
+        self.stdout.write(f'{len(pages)} page(s) synchronisée(s).')
+        self.stdout.write(
+            f'{len(to_create)} produit(s) ajouté(s), '
+            f'{len(to_update)} mis à jour, '
+            f'{len(to_delete)} supprimé(s).'
+        )
+        changed = set(self.changed_categories)
+        if to_create or to_update or to_delete:
+            changed.add(self.category.pk)
         try:
-            Product.objects.bulk_create(products)
+            with transaction.atomic():
+                load_products(to_create)
+                Product.objects.bulk_update(
+                    to_update, PRODUCT_FIELDS, batch_size=BATCH_SIZE
+                )
+                Product.objects.filter(pk__in=to_delete).delete()
+                # The changed categories are saved with the checkpoint,
+                # so a resumed synchronisation still scores them.
+                self.checkpoint(
+                    category_index=category_index + 1,
+                    changed_categories=json.dumps(sorted(changed))
+                )
+            self.changed_categories = changed
         except Exception as e:
+            self.errors += 1
             self.stdout.write(
                 self.style.ERROR(
-                    f"Error during product insertion:\n{e}\n"
+                    f"Error during product synchronisation:\n{e}\n"
                 )
             )
 
-    def insert_category(self, category_name):
+    def create_category(self, category_name):
+        """
+        Create a category into the table receiving the new catalogue.
+        Parameters
+        ----------
+        category_name : string
+            category's name.
+
+        Returns
+        -------
+        : Category
+            The category created.
+        """
+        if self.staging is not None:
+            return self.staging.insert_category(category_name)
+        return Category.objects.create(name=category_name)
+
+    def load_products(self, products):
+        """
+        Insert products into the table receiving the new catalogue.
+        Parameters
+        ----------
+        products : iterable
+            Unsaved products.
+
+        Returns
+        -------
+        : int
+            Number of products inserted.
+        """
+        if self.staging is not None:
+            return self.staging.load_products(products)
+        return load_products(products)
+
+    def insert_category(self, category_name, reuse=False):
         """
         Insert a category into the database.
         Parameters
         ----------
         category_name : string
             category's name.
+        reuse : bool
+            Reuse the category with the same name if it already exists.
 
         Raises
         ------
@@ -82,53 +494,559 @@ class Command(BaseCommand):
             selection.
         """
         try:
-            # Insert category into the database.
-            self.category = Category.objects.create(name=category_name)
-            self.category.save()
+            self.category = None
+            if reuse:
+                self.category = Category.objects\
+                    .filter(name=category_name)\
+                    .order_by("id")\
+                    .first()
+            if self.category is None:
+                # Insert category into the database.
+                self.category = self.create_category(category_name)
             self.stdout.write(
                 self.style.HTTP_INFO(
                     f"Category {category_name} sync in progress.."
                 )
             )
         except Exception as e:
+            self.errors += 1
             self.stdout.write(
                 self.style.ERROR(
                     f"Error during category insertion:\n{e}\nexit\n"
                 )
             )
 
+    def import_file(self, path):
+        """
+        Insert all products of an Open Food Facts export into the
+        database.
+        The export is streamed and products are inserted by batch so
+        the memory usage doesn't depend on the size of the export.
+        Parameters
+        ----------
+        path : string
+            Path of a JSONL or CSV export, optionally gzip compressed.
+
+        Raises
+        ------
+            CommandError : If the export can't be read or a product
+            can't be inserted.
+        """
+        categories = {}
+
+        def products():
+            for category_name, p in read_dump(path):
+                category = categories.get(category_name)
+                if category is None:
+                    category = self.create_category(category_name[:400])
+                    categories[category_name] = category
+                product = self.build_product(p, category)
+                if product is not None:
+                    yield product
+
+        try:
+            total = self.load_products(products())
+        except Exception as e:
+            raise CommandError(f"Error during product insertion:\n{e}") \
+                from e
+        self.stdout.write(f'{len(categories)} catégorie(s) synchronisée(s).')
+        self.stdout.write(f'{total} produit(s) synchronisé(s).')
+
     def truncate_tables(self):
         """
         Delete the data from each table.
+        The rows are deleted by a single query per table, the saved
+        products being unlinked beforehand, instead of being collected
+        by the ORM with the rows referring to them.
         """
         try:
-            tables = (Category, Product)
-            # Drop the tables and reset the auto increment start number
-            # to 1.
-            for table in tables:
-                table.objects.all().delete()
+            BackupProduct.objects\
+                .filter(product__isnull=False)\
+                .update(product=None)
+            # Delete the tables in the order of their foreign keys.
+            for table in (ProductSubstitute, Product, Category):
+                queryset = table.objects.all()
+                queryset._raw_delete(queryset.db)
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f"Error during droping tables:\n{e}\nexit\n")
             )
 
+    def clean_catalogue(self):
+        """
+        Prepare the tables receiving the new catalogue: the shadow
+        tables in swap mode, the live tables otherwise.
+        """
+        if self.staging is not None:
+            self.staging.create()
+        else:
+            self.truncate_tables()
+
+    def checkpoint(self, **fields):
+        """
+        Save the progress of the synchronisation.
+        Parameters
+        ----------
+        fields : dict
+            Fields of the synchronisation run to update.
+        """
+        if self.run is None:
+            # The workers of a parallel synchronisation leave the
+            # progress to the main process.
+            return
+        for name, value in fields.items():
+            setattr(self.run, name, value)
+        SyncRun.objects.filter(pk=self.run.pk).update(**fields)
+
+    def start_run(self, options):
+        """
+        Start a new synchronisation run or resume the last one which
+        didn't finish.
+        Returns
+        -------
+        categories : list
+            Categories to synchronise.
+        """
+        if options["resume"]:
+            self.run = SyncRun.objects\
+                .exclude(status=SyncRun.DONE)\
+                .order_by("-id")\
+                .first()
+            if self.run is None:
+                raise CommandError("There is no synchronisation to resume.")
+            if self.run.swap or self.run.from_file:
+                raise CommandError(
+                    f"The synchronisation #{self.run.pk} was started with "
+                    f"--swap or --from-file and can't be resumed."
+                )
+            if self.run.tier != (options["tier"] or ""):
+                raise CommandError(
+                    f"The synchronisation #{self.run.pk} was started with "
+                    f"--tier {self.run.tier or '(none)'}, it must be "
+                    f"resumed with the same tier."
+                )
+            self.checkpoint(status=SyncRun.RUNNING)
+            self.changed_categories = set(
+                json.loads(self.run.changed_categories)
+            )
+            self.stdout.write(
+                self.style.HTTP_INFO(
+                    f"Reprise de la synchronisation #{self.run.pk}: "
+                    f"{self.run.category_index} catégorie(s) et "
+                    f"{self.run.page} page(s) déjà synchronisée(s)."
+                )
+            )
+            return json.loads(self.run.categories)
+        if options["tier"]:
+            max_categories, max_products = CATALOGUE_TIERS[options["tier"]]
+        else:
+            max_categories = options["max_categories"]
+            max_products = options["max_products"]
+        response = self.fetch_page(CATEGORIES_URL)
+        # The number of products is capped here so that a resumed
+        # synchronisation keeps the same limits.
+        categories = [
+            {
+                "name": c["name"],
+                "url": c["url"],
+                "products": min(c["products"], max_products)
+            }
+            for c in response['tags'][:max_categories]
+        ]
+        self.run = SyncRun.objects.create(
+            incremental=options["incremental"],
+            swap=options["swap"],
+            tier=options["tier"] or "",
+            categories=json.dumps(categories)
+        )
+        return categories
+
+    def open_session(self, options):
+        """
+        Open the HTTP session and the response cache used to download
+        the pages.
+        """
+        workers = max(1, options["fetch_workers"])
+        self.session = requests.Session()
+        # Keep one open connection per worker.
+        adapter = HTTPAdapter(
+            pool_connections=workers, pool_maxsize=workers
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if options["cache_dir"]:
+            self.cache = ResponseCache(
+                options["cache_dir"], options["cache_size"] * 1024 * 1024
+            )
+
+    def synchronise_category(self, number, category, pages, incremental,
+                             first_page=1, resumed=False):
+        """
+        Synchronise a category with its pages.
+        Parameters
+        ----------
+        number : int
+            Position of the category in the synchronisation.
+        category : dict
+            Name, url and number of products of the category.
+        pages : iterable
+            Content of each page and whether it changed since the last
+            successful synchronisation.
+        incremental : bool
+            Apply the difference with the stored products instead of
+            inserting them.
+        first_page : int
+            Number of the first page.
+        resumed : bool
+            The category was being synchronised when the synchronisation
+            was interrupted.
+        """
+        self.insert_category(category['name'], reuse=incremental or resumed)
+        if self.category is None:
+            return
+        if incremental:
+            pages = list(pages)
+            if self.category.pk in self.known_categories and \
+                    not any(changed for _, changed in pages):
+                # None of the pages changed since the last
+                # synchronisation: nothing to parse nor to write.
+                self.stdout.write(f'Catégorie #{self.category.id} inchangée.')
+                self.checkpoint(category_index=number + 1)
+            else:
+                self.upsert_products(
+                    list(self.decode_pages(pages, category['products'])),
+                    number
+                )
+        else:
+            first_page = first_page if resumed else 1
+            self.insert_products(
+                self.decode_pages(pages, category['products'], first_page),
+                first_page=first_page
+            )
+            if self.errors:
+                return
+            self.checkpoint(category_index=number + 1, page=0)
+        self.stdout.write(100 * '=')
+
+    def synchronise_api(self, options):
+        """
+        Synchronise the catalogue with the Open Food Facts API.
+        """
+        workers = max(1, options["fetch_workers"])
+        self.open_session(options)
+        # Categories stored before the synchronisation.
+        self.known_categories = set(
+            Category.objects.values_list("pk", flat=True)
+        )
+        last_run = SyncRun.objects\
+            .filter(status=SyncRun.DONE)\
+            .order_by("-finished_at")\
+            .first()
+        self.synced_at = last_run.finished_at.timestamp() if last_run else 0
+        categories = self.start_run(options)
+        incremental = self.run.incremental
+        first_category = self.run.category_index
+        first_page = self.run.page + 1
+        # Skip the categories already synchronised.
+        categories = categories[first_category:]
+        urls = [
+            self.get_page_urls(category['products'], category['url'])
+            for category in categories
+        ]
+        if urls and not incremental:
+            # Skip the pages already inserted before the synchronisation
+            # was interrupted.
+            urls[0] = urls[0][first_page - 1:]
+        if not incremental and not options["resume"]:
+            # Clean the database.
+            self.clean_catalogue()
+        elif not incremental:
+            # Categories after the interrupted one may have been
+            # inserted by the workers of a parallel synchronisation.
+            Category.objects\
+                .filter(name__in=[
+                    c['name'] for c in categories[1 if self.run.page else 0:]
+                ])\
+                .delete()
+        tasks = [
+            (number, category, pages, incremental, first_page,
+             number == first_category and options["resume"])
+            for number, (category, pages) in enumerate(
+                zip(categories, urls), start=first_category)
+        ]
+        if options["workers"] > 1:
+            self.synchronise_parallel(tasks, options)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Download the pages of the categories in the background,
+                # a few pages ahead of the category being synchronised.
+                pages = self.prefetch(
+                    executor,
+                    (url for task in tasks for url in task[2]),
+                    window=workers * 2
+                )
+                for task in tasks:
+                    category_pages = islice(pages, len(task[2]))
+                    self.synchronise_category(
+                        task[0], task[1], category_pages, *task[3:]
+                    )
+                    if self.errors:
+                        # The checkpoint stays on the failed category.
+                        break
+                    # Skip the pages of a category which couldn't be
+                    # created.
+                    deque(category_pages, maxlen=0)
+        if incremental:
+            # Delete the categories which are no longer synchronised with
+            # their products.
+            Category.objects\
+                .exclude(name__in=[
+                    c['name'] for c in json.loads(self.run.categories)
+                ])\
+                .delete()
+        self.session.close()
+
+    def synchronise_parallel(self, tasks, options):
+        """
+        Synchronise the categories in a pool of processes.
+        Each process downloads, parses and inserts whole categories
+        over its own database connection. The output of each category
+        is written and the progress saved in the order of the
+        categories.
+        Parameters
+        ----------
+        tasks : list
+            Arguments of `synchronise_category` for each category, the
+            pages being given by their url.
+        """
+        # The processes must open their own database connection.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        pool = context.Pool(
+            processes=options["workers"],
+            initializer=start_worker,
+            initargs=(
+                options, self.known_categories, self.synced_at,
+                self.staging is not None
+            )
+        )
+        with pool:
+            for task, (output, errors, changed) in zip(
+                    tasks, pool.imap(synchronise_shard, tasks)):
+                self.errors += errors
+                self.changed_categories.update(changed)
+                self.stdout.write(output, ending="")
+                if errors:
+                    # The checkpoint stays on the failed category.
+                    break
+                self.checkpoint(
+                    category_index=task[0] + 1, page=0,
+                    changed_categories=json.dumps(
+                        sorted(self.changed_categories)
+                    )
+                )
+
+    def changed(self):
+        """
+        Get the categories whose products changed, None when the whole
+        catalogue was reloaded.
+        """
+        if self.run.incremental:
+            return sorted(self.changed_categories)
+        return None
+
+    def score_products(self):
+        """
+        Score the products of the synchronised catalogue, which ranks
+        their substitutes.
+        """
+        table = None
+        if self.staging is not None:
+            table = self.staging.tables[Product]
+        count = score_catalogue(
+            table, using=connection.alias, categories=self.changed()
+        )
+        self.stdout.write(f"{count} produits notés.")
+
+    def refresh_substitutes(self, options):
+        """
+        Store the substitutes of the products of the synchronised
+        catalogue, the categories being shared between the workers on
+        PostgreSQL.
+        """
+        tables = None
+        workers = 1
+        if self.staging is not None:
+            tables = self.staging.tables
+        if connection.vendor == "postgresql" and \
+                not connection.in_atomic_block:
+            workers = options["workers"]
+        start = time.perf_counter()
+        count = refresh_all_substitutes(
+            tables, workers, connection.alias, self.changed()
+        )
+        self.stdout.write(
+            f"{count} substituts calculés en "
+            f"{time.perf_counter() - start:.2f} s."
+        )
+
+    def link_saved_products(self):
+        """
+        Link the products saved by the users to the synchronised
+        catalogue, which replaced the products they referred to.
+        """
+        count = link_saved_products(fetch=True, using=connection.alias)
+        self.stdout.write(f"{count} produit(s) enregistré(s) relié(s).")
+
+    def synchronise(self, options):
+        """
+        Synchronise the catalogue from the source given in options.
+        """
+        try:
+            if options["from_file"]:
+                self.run = SyncRun.objects.create(
+                    swap=options["swap"], from_file=options["from_file"]
+                )
+                # The live catalogue is only emptied if the whole export
+                # is imported.
+                with transaction.atomic():
+                    # Clean the database.
+                    self.clean_catalogue()
+                    self.import_file(options["from_file"])
+            else:
+                self.synchronise_api(options)
+            if self.errors:
+                # An incomplete catalogue is never published, the run is
+                # left to be resumed.
+                if options["swap"]:
+                    advice = "le catalogue n'est pas publié"
+                else:
+                    advice = "reprendre avec --resume"
+                raise CommandError(
+                    f"{self.errors} erreur(s) pendant la synchronisation, "
+                    f"{advice}."
+                )
+            self.score_products()
+            self.refresh_substitutes(options)
+            if self.staging is not None:
+                self.staging.swap()
+                self.stdout.write("Catalogue publié.")
+            self.checkpoint(status=SyncRun.DONE, finished_at=timezone.now())
+        except BaseException:
+            if self.staging is not None:
+                self.staging.drop()
+            if self.run is not None:
+                try:
+                    self.checkpoint(status=SyncRun.FAILED)
+                except DatabaseError:
+                    # The transaction of the synchronisation is broken,
+                    # the run stays in progress and can still be resumed.
+                    pass
+            raise
+
     def handle(self, *args, **options):
         """
         Handle to add data to the database.
         """
-        response = requests.get(CATEGORIES_URL).json()
-        # Clean the database.
-        self.truncate_tables()
-        # Re-insert all categories and their products in the database.
-        for category_number, category in enumerate(response['tags']):
-            # Limit category number to 20.
-            if category_number > 19:
-                break
-            self.insert_category(category['name'])
-            self.insert_products(category['products'], category['url'])
-            self.stdout.write(100 * '=')
+        if options["incremental"] and (
+                options["from_file"] or options["swap"]):
+            raise CommandError(
+                "--incremental can't be combined with --from-file or --swap."
+            )
+        if options["resume"] and (options["from_file"] or options["swap"]):
+            raise CommandError(
+                "--resume can't be combined with --from-file or --swap."
+            )
+        if options["max_categories"] < 1 or options["max_products"] < 1:
+            raise CommandError(
+                "--max-categories and --max-products must be positive."
+            )
+        if options["workers"] > 1 and (
+                options["from_file"] or
+                options["swap"] and connection.vendor != "postgresql"):
+            raise CommandError(
+                "--workers can't be combined with --from-file, nor with "
+                "--swap on another database than PostgreSQL."
+            )
+        self.run = None
+        self.staging = None
+        self.errors = 0
+        self.changed_categories = set()
+        if options["swap"] and connection.vendor == "postgresql":
+            self.staging = StagingCatalogue(connection)
+            self.synchronise(options)
+        elif options["swap"]:
+            # Without shadow tables the whole reload is done in a single
+            # transaction, so it is only visible once complete.
+            with transaction.atomic():
+                self.synchronise(options)
+        else:
+            self.synchronise(options)
+        # The search results cached for the previous catalogue are
+        # left to expire.
+        publish_generation(self.run.pk)
+        self.link_saved_products()
         self.stdout.write(
             self.style.SUCCESS(
                 "Synchronisation de la base de donnée effectuée avec success."
             )
         )
+
+
+# Command of the current process of a parallel synchronisation.
+worker = None
+
+
+def start_worker(options, known_categories, synced_at, swap):
+    """
+    Prepare a process of a parallel synchronisation.
+    Parameters
+    ----------
+    options : dict
+        Options of the synchronisation.
+    known_categories : set
+        Identifiers of the categories stored before the
+        synchronisation.
+    synced_at : float
+        Timestamp of the end of the last successful synchronisation.
+    swap : bool
+        Insert the catalogue into the shadow tables.
+    """
+    global worker
+    worker = Command()
+    worker.open_session(options)
+    worker.fetch_workers = max(1, options["fetch_workers"])
+    worker.known_categories = known_categories
+    worker.synced_at = synced_at
+    if swap:
+        worker.staging = StagingCatalogue(connection)
+
+
+def synchronise_shard(task):
+    """
+    Synchronise a category in a process of a parallel synchronisation.
+    The category is written in a single transaction, so it is either
+    complete or missing if the synchronisation is interrupted.
+    Parameters
+    ----------
+    task : tuple
+        Arguments of `Command.synchronise_category`, the pages being
+        given by their url.
+
+    Returns
+    -------
+    output, errors, changed : tuple
+        Output of the synchronisation of the category, number of pages
+        which couldn't be synchronised and identifiers of the categories
+        whose products changed.
+    """
+    output = StringIO()
+    worker.stdout = OutputWrapper(output)
+    worker.errors = 0
+    worker.changed_categories = set()
+    number, category, urls, *arguments = task
+    with ThreadPoolExecutor(max_workers=worker.fetch_workers) as executor:
+        pages = executor.map(worker.download, urls)
+        with transaction.atomic():
+            worker.synchronise_category(number, category, pages, *arguments)
+    return output.getvalue(), worker.errors, worker.changed_categories
@@ -0,0 +1,26 @@
+# Generated by Django 3.0.14 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0002_backupproduct_category_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'En cours'), ('done', 'Terminée'), ('failed', 'Échouée')], default='running', max_length=10)),
+                ('incremental', models.BooleanField(default=False)),
+                ('categories', models.TextField(default='[]')),
+                ('category_index', models.PositiveIntegerField(default=0)),
+                ('page', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
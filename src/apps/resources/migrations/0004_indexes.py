@@ -0,0 +1,72 @@
+# Generated by Django 3.0.14 on 2026-10-18 12:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def merge_categories(apps, schema_editor):
+    """
+    Move the products of the categories with the same name into the
+    oldest one and delete the others.
+    """
+    Category = apps.get_model("resources", "Category")
+    Product = apps.get_model("resources", "Product")
+    duplicates = Category.objects\
+        .values("name")\
+        .annotate(first=models.Min("id"), total=models.Count("id"))\
+        .filter(total__gt=1)
+    for duplicate in duplicates:
+        others = Category.objects\
+            .filter(name=duplicate["name"])\
+            .exclude(id=duplicate["first"])
+        Product.objects\
+            .filter(category__in=others)\
+            .update(category=duplicate["first"])
+        others.delete()
+    if schema_editor.connection.vendor == "postgresql":
+        # Check the deferred foreign keys of the moved products now, the
+        # category table can't be altered while they are pending.
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('resources', '0003_syncrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='backupproduct',
+            index=models.Index(fields=['user', 'product_code'], name='resources_backup_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['code'], name='resources_product_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'nutrition_grades', 'id'], name='resources_product_grade_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_name'], name='resources_product_name_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AlterField(
+            model_name='backupproduct',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='resources.Category'),
+        ),
+        migrations.RunPython(merge_categories, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(fields=('name',), name='resources_category_name_uniq'),
+        ),
+    ]
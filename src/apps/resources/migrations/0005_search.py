@@ -0,0 +1,71 @@
+# Generated by Django 3.0.14 on 2026-10-18 12:48
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+# French configuration which ignores the accents.
+CREATE_CONFIG = """
+CREATE TEXT SEARCH CONFIGURATION french_unaccent (COPY = french);
+ALTER TEXT SEARCH CONFIGURATION french_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+"""
+# The brand weighs less than the name of the product.
+CREATE_TRIGGER = """
+CREATE FUNCTION resources_product_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector(
+            'french_unaccent', coalesce(NEW.product_name, '')
+        ), 'A') ||
+        setweight(to_tsvector(
+            'french_unaccent', coalesce(NEW.warehouse, '')
+        ), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER resources_product_search_vector
+    BEFORE INSERT OR UPDATE OF product_name, warehouse
+    ON resources_product
+    FOR EACH ROW EXECUTE PROCEDURE resources_product_search_vector();
+UPDATE resources_product SET product_name = product_name;
+CREATE INDEX resources_product_search_idx
+    ON resources_product USING gin (search_vector);
+"""
+DROP_TRIGGER = """
+DROP INDEX resources_product_search_idx;
+DROP TRIGGER resources_product_search_vector ON resources_product;
+DROP FUNCTION resources_product_search_vector();
+DROP TEXT SEARCH CONFIGURATION french_unaccent;
+"""
+
+
+def create_search(apps, schema_editor):
+    """
+    Maintain the search vector of the products on PostgreSQL.
+    """
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_CONFIG)
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0004_indexes'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
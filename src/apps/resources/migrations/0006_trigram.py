@@ -0,0 +1,39 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+CREATE_INDEXES = """
+CREATE INDEX resources_product_name_trgm_idx
+    ON resources_product USING gin (product_name gin_trgm_ops);
+CREATE INDEX resources_product_brand_trgm_idx
+    ON resources_product USING gin (warehouse gin_trgm_ops);
+"""
+DROP_INDEXES = """
+DROP INDEX resources_product_name_trgm_idx;
+DROP INDEX resources_product_brand_trgm_idx;
+"""
+
+
+def create_indexes(apps, schema_editor):
+    """
+    Index the trigrams of the name and brand of the products on
+    PostgreSQL.
+    """
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_INDEXES)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0005_search'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.0.14 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+# Points of the scoring of the products when the score was added, the
+# migration doesn't follow later changes of apps.resources.scoring.
+GRADE_POINTS = {"a": 0, "b": 10, "c": 20, "d": 30, "e": 40}
+LEVEL_POINTS = {"low": 0, "moderate": 1, "high": 2}
+UNKNOWN_GRADE = 50
+UNKNOWN_LEVEL = 1
+
+
+def score_products(apps, schema_editor):
+    """
+    Score the products of the current catalogue, one category at a
+    time.
+    """
+    alias = schema_editor.connection.alias
+    Product = apps.get_model("resources", "Product")
+    products = Product.objects.using(alias)
+    categories = products\
+        .order_by()\
+        .values_list("category_id", flat=True)\
+        .distinct()
+    for category in list(categories):
+        scored = []
+        for product in products\
+                .filter(category_id=category)\
+                .only("nutrition_grades", "salt", "fat", "sugars",
+                      "saturated_fat"):
+            product.score = GRADE_POINTS.get(
+                product.nutrition_grades, UNKNOWN_GRADE
+            ) + sum(
+                LEVEL_POINTS.get(level, UNKNOWN_LEVEL) for level in (
+                    product.salt, product.fat, product.sugars,
+                    product.saturated_fat
+                )
+            )
+            scored.append(product)
+        products.bulk_update(scored, ["score"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0006_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='score',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(score_products, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='resources_product_grade_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'score', 'id'], name='resources_product_score_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.0.14 on 2026-10-18 13:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Substitutes of the products when they were first stored, the
+# migration doesn't follow later changes of apps.resources.substitutes:
+# the 12 best products of the category strictly better than the product.
+INSERT_SUBSTITUTES = """
+INSERT INTO {substitutes} (product_id, substitute_id, rank)
+SELECT product.id, best.id, best.position
+FROM {products} product
+JOIN (
+    SELECT id, category_id, score, ROW_NUMBER() OVER (
+        PARTITION BY category_id ORDER BY score, id
+    ) AS position
+    FROM {products}
+    WHERE score IS NOT NULL
+) best ON best.category_id = product.category_id
+    AND best.position <= 12
+    AND best.score < product.score
+WHERE product.score IS NOT NULL
+"""
+
+
+def store_substitutes(apps, schema_editor):
+    """
+    Store the substitutes of the current catalogue.
+    """
+    quote = schema_editor.connection.ops.quote_name
+    schema_editor.execute(INSERT_SUBSTITUTES.format(
+        products=quote(apps.get_model("resources", "Product")._meta.db_table),
+        substitutes=quote(
+            apps.get_model("resources", "ProductSubstitute")._meta.db_table
+        )
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0007_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSubstitute',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='substitutes', to='resources.Product')),
+                ('substitute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='substituted', to='resources.Product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productsubstitute',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='resources_substitute_rank_uniq'),
+        ),
+        migrations.RunPython(store_substitutes, migrations.RunPython.noop),
+    ]
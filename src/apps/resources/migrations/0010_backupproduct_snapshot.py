@@ -0,0 +1,97 @@
+# Generated by Django 3.0.14 on 2026-10-18 13:30
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Fields of a product kept by the snapshot when it was added, the
+# migration doesn't follow later changes of the model.
+SNAPSHOT_FIELDS = (
+    "product_name", "img_url", "url", "salt", "fat", "sugars",
+    "saturated_fat", "warehouse", "allergens", "nutrition_grades",
+)
+BATCH_SIZE = 1000
+
+
+def backfill_saved_products(apps, schema_editor):
+    """
+    Link the saved products to the current catalogue and take their
+    snapshot, by batches of identifiers. The products missing from the
+    catalogue are taken from the products already fetched from Open
+    Food Facts, without calling it.
+    """
+    alias = schema_editor.connection.alias
+    BackupProduct = apps.get_model("resources", "BackupProduct")
+    Product = apps.get_model("resources", "Product")
+    ExternalProductCache = apps.get_model(
+        "resources", "ExternalProductCache"
+    )
+    last = 0
+    while True:
+        batch = list(
+            BackupProduct.objects.using(alias)
+            .filter(id__gt=last)
+            .order_by("id")[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        last = batch[-1].id
+        codes = {saved.product_code for saved in batch}
+        catalogue = {}
+        for product in Product.objects.using(alias)\
+                .filter(code__in=codes)\
+                .select_related("category")\
+                .order_by("-id"):
+            # The first product of a code in a category wins.
+            catalogue[product.code, product.category.name] = product
+        fetched = dict(
+            ExternalProductCache.objects.using(alias)
+            .filter(code__in=codes)
+            .exclude(data=None)
+            .values_list("code", "data")
+        )
+        updated = []
+        for saved in batch:
+            product = catalogue.get(
+                (saved.product_code, saved.category_name)
+            )
+            if product is not None:
+                saved.product = product
+                data = {
+                    field: getattr(product, field)
+                    for field in SNAPSHOT_FIELDS
+                }
+            elif saved.product_code in fetched:
+                data = json.loads(fetched[saved.product_code])
+            else:
+                continue
+            saved.snapshot = json.dumps(
+                {field: data.get(field) for field in SNAPSHOT_FIELDS},
+                ensure_ascii=False, separators=(",", ":")
+            )
+            updated.append(saved)
+        BackupProduct.objects.using(alias).bulk_update(
+            updated, ["product", "snapshot"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0009_externalproductcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupproduct',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='saved', to='resources.Product'),
+        ),
+        migrations.AddField(
+            model_name='backupproduct',
+            name='snapshot',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_saved_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.14 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0010_backupproduct_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='from_file',
+            field=models.CharField(blank=True, default='', max_length=400),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='swap',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='syncrun',
+            name='tier',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
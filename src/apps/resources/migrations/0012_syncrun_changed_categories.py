@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0011_syncrun_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='changed_categories',
+            field=models.TextField(default='[]'),
+        ),
+    ]
@@ -1,5 +1,17 @@
+import json
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVectorField
+)
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.utils.functional import cached_property
+
+from .constants import SEARCH_CONFIG
+from .lookups import TrigramWordSimilarity
 
 
 class Category(models.Model):
@@ -10,11 +22,162 @@ class Category(models.Model):
 
     class Meta:
         verbose_name_plural = "Categories"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name"], name="resources_category_name_uniq"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def search(self, words):
+        """
+        Search products by their name and brand.
+        On PostgreSQL the products are searched in their text search
+        vector and ranked by relevance. When nothing matches, the
+        products whose name or brand looks like the words are returned
+        instead, or along with them if the SEARCH_FUZZY setting is
+        "always". Other databases fall back on a case-insensitive
+        search of the name which ranks the products whose name starts
+        with the words first.
+
+        Parameters
+        ----------
+        words : str
+            Words searched.
+
+        Returns
+        -------
+        : ProductQuerySet
+            Matching products annotated with their `rank`, the most
+            relevant first.
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self\
+                .filter(product_name__icontains=words)\
+                .annotate(rank=models.Case(
+                    models.When(product_name__istartswith=words, then=1.0),
+                    default=0.0,
+                    output_field=models.FloatField()
+                ))\
+                .order_by("-rank", "id")
+        query = SearchQuery(words, config=SEARCH_CONFIG)
+        if settings.SEARCH_FUZZY == "always":
+            return self\
+                .filter(
+                    models.Q(search_vector=query)
+                    | self.similar_to(words)
+                )\
+                .annotate(rank=(
+                    SearchRank(models.F("search_vector"), query)
+                    + self.similarity(words)
+                ))\
+                .order_by("-rank", "id")
+        products = self\
+            .filter(search_vector=query)\
+            .annotate(rank=SearchRank(models.F("search_vector"), query))\
+            .order_by("-rank", "id")
+        if settings.SEARCH_FUZZY == "fallback" and not products.exists():
+            return self.fuzzy_search(words)
+        return products
+
+    def similar_to(self, words):
+        """
+        Condition on the products whose name or brand contains a word
+        similar to the words, served by the trigram indexes.
+        """
+        return models.Q(product_name__trigram_word_similar=words) \
+            | models.Q(warehouse__trigram_word_similar=words)
+
+    def similarity(self, words):
+        """
+        Similarity between the words and the name or the brand of a
+        product.
+        """
+        return Greatest(
+            TrigramWordSimilarity(words, "product_name"),
+            TrigramWordSimilarity(words, "warehouse")
+        )
+
+    def fuzzy_search(self, words):
+        """
+        Search products whose name or brand looks like the words, e.g.
+        misspelt words. Requires PostgreSQL.
+
+        Parameters
+        ----------
+        words : str
+            Words searched.
+
+        Returns
+        -------
+        : ProductQuerySet
+            Matching products annotated with their `rank`, the most
+            similar first.
+        """
+        return self\
+            .filter(self.similar_to(words))\
+            .annotate(rank=self.similarity(words))\
+            .order_by("-rank", "id")
+
+    def substitutes(self, product_id):
+        """
+        Get the substitutes of a product stored by
+        `refresh_substitutes`: the best products of its category which
+        are strictly better than it.
+
+        Parameters
+        ----------
+        product_id : int
+            Product identifier.
+
+        Returns
+        -------
+        : ProductQuerySet
+            At most SUBSTITUTES_LIMIT products of the category with a
+            lower score, the best first.
+        """
+        return self\
+            .filter(substituted__product=product_id)\
+            .order_by("substituted__rank")
+
+    def with_substitutes(self, product_id):
+        """
+        Get a product and its substitutes in a single query.
+
+        Parameters
+        ----------
+        product_id : int
+            Product identifier.
+
+        Returns
+        -------
+        product, substitutes : tuple
+            Product and list of the products that can replace it.
+
+        Raises
+        ------
+            Product.DoesNotExist : If the product doesn't exist.
+        """
+        product_id = int(product_id)
+        substitutes = self.substitutes(product_id).values("id")
+        products = list(
+            self
+            .filter(Q(id=product_id) | Q(id__in=substitutes))
+            .order_by("score", "id")
+        )
+        for product in products:
+            if product.id == product_id:
+                products.remove(product)
+                return product, products
+        raise self.model.DoesNotExist(
+            f"Product {product_id} does not exist."
+        )
+
+
 class Product(models.Model):
     """
     Product model.
@@ -30,7 +193,36 @@ class Product(models.Model):
     warehouse = models.CharField(max_length=400, blank=True, null=True)
     allergens = models.CharField(max_length=400, blank=True, null=True)
     nutrition_grades = models.CharField(max_length=1)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    # Indexed by the substitutes index.
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, db_index=False
+    )
+    # Name and brand of the product maintained by a trigger on
+    # PostgreSQL.
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+    # Nutrition grade and nutrient levels combined, the lower the
+    # better, computed by sync_database.
+    score = models.PositiveSmallIntegerField(
+        blank=True, null=True, editable=False
+    )
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["code"], name="resources_product_code_idx"),
+            # Substitutes of a product, in the order of their score.
+            models.Index(
+                fields=["category", "score", "id"],
+                name="resources_product_score_idx"
+            ),
+            # Search of the products whose name starts with a word.
+            models.Index(
+                fields=["product_name"],
+                name="resources_product_name_idx",
+                opclasses=["varchar_pattern_ops"]
+            ),
+        ]
 
     def __str__(self):
         return self.product_name
@@ -50,13 +242,72 @@ class Product(models.Model):
         products: list
             List of products that can replace the selected product.
         """
-        # Get products from a category sorted by nutrition grades.
-        category_id = int(cls.objects.get(pk=product_id).category.id)
-        products = cls.objects\
-            .filter(category=category_id)\
-            .exclude(id=product_id)\
-            .order_by("nutrition_grades")[:12]
-        return products
+        # Get better products from a category sorted by score.
+        return cls.objects.substitutes(product_id)
+
+    @classmethod
+    def get_substitutes_bulk(cls, product_ids):
+        """
+        Get the substitutes of several products in a single query.
+
+        Parameters
+        ----------
+        product_ids : list
+            Product identifiers.
+
+        Returns
+        -------
+        : dict
+            List of the products that can replace each product, empty
+            for an unknown product.
+        """
+        substitutes = {pk: [] for pk in product_ids}
+        # The substitutes are stored with their rank in the category,
+        # computed by `refresh_substitutes`.
+        links = ProductSubstitute.objects\
+            .filter(product__in=product_ids)\
+            .select_related("substitute")\
+            .order_by("product", "rank")
+        for link in links:
+            substitutes[link.product_id].append(link.substitute)
+        return substitutes
+
+
+class ProductSubstitute(models.Model):
+    """
+    Substitute of a product model, refreshed after each
+    synchronisation.
+    """
+    # Indexed by the rank constraint.
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="substitutes",
+        db_index=False
+    )
+    substitute = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="substituted"
+    )
+    # Position of the substitute, from 1 for the best one.
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "rank"],
+                name="resources_substitute_rank_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.substitute_id} ({self.rank})"
+
+
+# Fields of a product kept by the products saved by the users.
+SNAPSHOT_FIELDS = (
+    "product_name", "img_url", "url", "salt", "fat", "sugars",
+    "saturated_fat", "warehouse", "allergens", "nutrition_grades",
+)
 
 
 class BackupProduct(models.Model):
@@ -65,7 +316,128 @@ class BackupProduct(models.Model):
     """
     product_code = models.CharField(max_length=30)
     category_name = models.CharField(max_length=400)
-    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    # Product of the catalogue, unset when a synchronisation removes it
+    # until the saved product is linked again.
+    product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, related_name="saved",
+        blank=True, null=True
+    )
+    # JSON object of the SNAPSHOT_FIELDS of the product when it was
+    # saved, shown by the saved products.
+    snapshot = models.TextField(blank=True, null=True, editable=False)
+    # Indexed by the index of the saved products.
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, db_index=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "product_code"],
+                name="resources_backup_user_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.product_code
+
+    @staticmethod
+    def snapshot_of(product):
+        """
+        Get the snapshot of a product.
+
+        Parameters
+        ----------
+        product : Product or dict
+            Product of the catalogue or fields of a product.
+
+        Returns
+        -------
+        : str
+            Compact JSON object of the SNAPSHOT_FIELDS of the product.
+        """
+        if not isinstance(product, dict):
+            product = {
+                field: getattr(product, field) for field in SNAPSHOT_FIELDS
+            }
+        return json.dumps(
+            {field: product.get(field) for field in SNAPSHOT_FIELDS},
+            ensure_ascii=False, separators=(",", ":")
+        )
+
+    @cached_property
+    def data(self):
+        """
+        Fields of the product kept by the snapshot, empty when it
+        wasn't taken.
+        """
+        return json.loads(self.snapshot) if self.snapshot else {}
+
+    @classmethod
+    def saved_products(cls, user):
+        """
+        Get the products saved by a user, read from their snapshot
+        without looking them up in the catalogue.
+
+        Parameters
+        ----------
+        user : User
+            User who saved the products.
+
+        Returns
+        -------
+        : QuerySet
+            Saved products in the order they were saved.
+        """
+        return cls.objects.filter(user=user).order_by("id")
+
+
+class ExternalProductCache(models.Model):
+    """
+    Product fetched from Open Food Facts for a saved product missing
+    from the catalogue.
+    """
+    code = models.CharField(max_length=30, unique=True)
+    # JSON object of the fields shown, null if Open Food Facts doesn't
+    # know the product.
+    data = models.TextField(blank=True, null=True)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.code
+
+
+class SyncRun(models.Model):
+    """
+    Synchronisation of the catalogue model.
+    """
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (RUNNING, "En cours"),
+        (DONE, "Terminée"),
+        (FAILED, "Échouée"),
+    )
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=RUNNING)
+    incremental = models.BooleanField(default=False)
+    # Mode of the synchronisation, which a resumed synchronisation must
+    # share: loaded into the shadow tables, path of the imported export
+    # and size of the catalogue.
+    swap = models.BooleanField(default=False)
+    from_file = models.CharField(max_length=400, blank=True, default="")
+    tier = models.CharField(max_length=10, blank=True, default="")
+    # JSON list of the categories to synchronise.
+    categories = models.TextField(default="[]")
+    # Checkpoint: number of categories synchronised and number of pages
+    # synchronised in the next category.
+    category_index = models.PositiveIntegerField(default=0)
+    page = models.PositiveIntegerField(default=0)
+    # JSON list of the ids of the categories whose products changed
+    # during an incremental synchronisation.
+    changed_categories = models.TextField(default="[]")
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} ({self.status})"
@@ -0,0 +1,92 @@
+import base64
+import json
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from .constants import SEARCH_PAGE_SIZE
+
+
+def encode_cursor(product):
+    """
+    Encode the position of a product in search results.
+
+    Parameters
+    ----------
+    product : Product
+        Product annotated with its `rank`.
+
+    Returns
+    -------
+    : str
+        Opaque cursor which can be put in an url.
+    """
+    data = json.dumps([product.cursor_rank, product.pk]).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode the position encoded by `encode_cursor`.
+
+    Returns
+    -------
+    rank, pk : tuple
+        Rank and identifier of the product.
+
+    Raises
+    ------
+        ValueError : If the cursor is invalid.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, pk = json.loads(data.decode("utf-8"))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(rank, (int, float)) or not isinstance(pk, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return float(rank), pk
+
+
+def paginate(queryset, cursor=None, size=SEARCH_PAGE_SIZE):
+    """
+    Get a page of search results.
+    The page starts after the product of the cursor instead of
+    skipping the previous pages with an offset, so every page costs
+    the same.
+
+    Parameters
+    ----------
+    queryset : ProductQuerySet
+        Products annotated with their `rank` and ordered by decreasing
+        rank then increasing id.
+    cursor : str
+        Cursor of the last product of the previous page, None for the
+        first page.
+    size : int
+        Number of products of the page.
+
+    Returns
+    -------
+    products, next_cursor : tuple
+        Products of the page and the cursor of the next page, None if
+        it is the last page.
+
+    Raises
+    ------
+        ValueError : If the cursor is invalid.
+    """
+    # The rank is compared in double precision so that the rank read
+    # from the cursor is exactly the one computed by the database.
+    queryset = queryset.annotate(
+        cursor_rank=Cast(F("rank"), FloatField())
+    )
+    if cursor:
+        rank, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(cursor_rank__lt=rank) | Q(cursor_rank=rank, id__gt=pk)
+        )
+    products = list(queryset[:size + 1])
+    if len(products) > size:
+        return products[:size], encode_cursor(products[size - 1])
+    return products, None
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+from .constants import PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL
+from .generation import catalogue_generation
+from .models import Product
+from .substituteindex import substitute_engine
+
+
+class ProductRecord(NamedTuple):
+    """
+    Fields of a product shown by the product page.
+    """
+    pk: int
+    product_name: str
+    code: str
+    img_url: Optional[str]
+    url: Optional[str]
+    nutrition_grades: str
+
+    @classmethod
+    def from_product(cls, product):
+        return cls(*(getattr(product, field) for field in cls._fields))
+
+
+class ProductPage(NamedTuple):
+    """
+    Product and substitutes shown by the product page.
+    """
+    product: ProductRecord
+    substitutes: Tuple[ProductRecord, ...]
+
+
+class LRUCache:
+    """
+    Bounded cache which forgets the least recently used entries and
+    the entries older than a time to live.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of entries.
+    ttl : float
+        Seconds during which an entry is kept.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # Value and expiry time of each key, the most recent last.
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Get the value of a key, None if it isn't cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """
+        Cache the value of a key.
+        """
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Get the metrics of the cache.
+
+        Returns
+        -------
+        : dict
+            Number of entries, maximum number of entries, number of hits
+            and misses and ratio of hits.
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class ProductPageCache:
+    """
+    Pages of the products kept in the memory of the process, emptied
+    when the generation of the catalogue changes.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of pages.
+    ttl : float
+        Seconds during which a page is kept.
+    """
+    def __init__(self, max_size=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL):
+        self.pages = LRUCache(max_size, ttl)
+        self.generation = None
+
+    def get(self, product_id):
+        """
+        Get the page of a product.
+
+        Parameters
+        ----------
+        product_id : int
+            Product identifier.
+
+        Returns
+        -------
+        : ProductPage
+            Product and its substitutes.
+
+        Raises
+        ------
+            Product.DoesNotExist : If the product doesn't exist.
+        """
+        product_id = int(product_id)
+        generation = catalogue_generation()
+        if generation != self.generation:
+            self.pages.clear()
+            self.generation = generation
+        page = self.pages.get(product_id)
+        if page is None:
+            product, substitutes = self.load(product_id)
+            page = ProductPage(
+                ProductRecord.from_product(product),
+                tuple(ProductRecord.from_product(s) for s in substitutes)
+            )
+            self.pages.set(product_id, page)
+        return page
+
+    def load(self, product_id):
+        """
+        Read a product and its substitutes, which are found in the
+        memory of the process when the SUBSTITUTES_ENGINE setting is
+        "memory".
+
+        Returns
+        -------
+        product, substitutes : tuple
+            Product and list of the products that can replace it.
+
+        Raises
+        ------
+            Product.DoesNotExist : If the product doesn't exist.
+        """
+        if settings.SUBSTITUTES_ENGINE != "memory":
+            return Product.objects.with_substitutes(product_id)
+        ids = substitute_engine.substitutes(product_id)
+        products = Product.objects.in_bulk([product_id] + ids)
+        if product_id not in products:
+            raise Product.DoesNotExist(
+                f"Product {product_id} does not exist."
+            )
+        return products[product_id], [
+            products[pk] for pk in ids if pk in products
+        ]
+
+    def clear(self):
+        self.pages.clear()
+
+    def stats(self):
+        return self.pages.stats()
+
+
+product_pages = ProductPageCache()
@@ -0,0 +1,82 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from .constants import SAVED_BATCH_SIZE
+from .external import external_products
+from .models import BackupProduct, Product
+
+
+def link_saved_products(batch_size=SAVED_BATCH_SIZE, fetch=False,
+                        using=DEFAULT_DB_ALIAS):
+    """
+    Link the saved products to the product of the catalogue which has
+    their code in the category of their name, and take the snapshot of
+    the ones saved without it.
+
+    The saved products are read and updated in batches of identifiers
+    so a large table is never loaded at once.
+
+    Parameters
+    ----------
+    batch_size : int
+        Number of saved products read at once.
+    fetch : bool
+        Take the snapshot of the products missing from the catalogue
+        from Open Food Facts.
+    using : str
+        Alias of the database.
+
+    Returns
+    -------
+    : int
+        Number of saved products updated.
+    """
+    saved_products = BackupProduct.objects.using(using)\
+        .filter(Q(product=None) | Q(snapshot=None))\
+        .order_by("id")
+    count, last = 0, 0
+    while True:
+        batch = list(saved_products.filter(id__gt=last)[:batch_size])
+        if not batch:
+            return count
+        last = batch[-1].id
+        catalogue, linked = {}, {}
+        for product in Product.objects.using(using)\
+                .filter(
+                    Q(code__in={saved.product_code for saved in batch}) |
+                    Q(id__in={saved.product_id for saved in batch})
+                )\
+                .select_related("category")\
+                .order_by("-id"):
+            # The first product of a code in a category wins.
+            catalogue[product.code, product.category.name] = product
+            linked[product.id] = product
+        updated = []
+        for saved in batch:
+            product = linked.get(saved.product_id) or catalogue.get(
+                (saved.product_code, saved.category_name)
+            )
+            if product is None:
+                continue
+            saved.product = product
+            if saved.snapshot is None:
+                saved.snapshot = BackupProduct.snapshot_of(product)
+            updated.append(saved)
+        missing = [
+            saved for saved in batch
+            if saved.product_id is None and saved.snapshot is None
+        ]
+        if fetch and missing:
+            external = external_products(
+                saved.product_code for saved in missing
+            )
+            for saved in missing:
+                if saved.product_code in external:
+                    saved.snapshot = BackupProduct.snapshot_of(
+                        external[saved.product_code]
+                    )
+                    updated.append(saved)
+        BackupProduct.objects.using(using).bulk_update(
+            updated, ["product", "snapshot"]
+        )
+        count += len(updated)
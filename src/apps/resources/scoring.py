@@ -0,0 +1,117 @@
+import numpy as np
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import Product
+
+# Points of the nutrition grades and of the nutrient levels, the lower
+# the better. A grade outweighs all the nutrient levels together, so
+# the levels only order the products of a same grade.
+GRADE_POINTS = {"a": 0, "b": 10, "c": 20, "d": 30, "e": 40}
+LEVEL_POINTS = {"low": 0, "moderate": 1, "high": 2}
+# Points of an unknown grade and of an unknown level.
+UNKNOWN_GRADE = 50
+UNKNOWN_LEVEL = 1
+NUTRIENTS = ("salt", "fat", "sugars", "saturated_fat")
+
+
+def points(values, table, unknown):
+    """
+    Get the points of each value of an array.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Values of a column, None when unknown.
+    table : dict
+        Points of each known value.
+    unknown : int
+        Points of an unknown value.
+
+    Returns
+    -------
+    : numpy.ndarray
+        Points of the values.
+    """
+    distinct, inverse = np.unique(values.astype(str), return_inverse=True)
+    return np.array(
+        [table.get(value, unknown) for value in distinct], dtype=np.int16
+    )[inverse.reshape(-1)]
+
+
+def compute_scores(rows):
+    """
+    Compute the score of products, the lower the better.
+
+    Parameters
+    ----------
+    rows : list
+        Nutrition grade, salt, fat, sugars and saturated fat levels of
+        each product.
+
+    Returns
+    -------
+    : numpy.ndarray
+        Score of each product.
+    """
+    if not rows:
+        return np.zeros(0, dtype=np.int16)
+    columns = np.array(rows, dtype=object).T
+    scores = points(columns[0], GRADE_POINTS, UNKNOWN_GRADE)
+    for column in columns[1:]:
+        scores += points(column, LEVEL_POINTS, UNKNOWN_LEVEL)
+    return scores
+
+
+def score_catalogue(table=None, using=DEFAULT_DB_ALIAS, categories=None):
+    """
+    Store the score of every product, one category at a time.
+
+    Parameters
+    ----------
+    table : str
+        Table of the products, the product table by default.
+    using : str
+        Alias of the database.
+    categories : list
+        Identifiers of the categories whose products are scored, all the
+        categories by default.
+
+    Returns
+    -------
+    : int
+        Number of products scored.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(table or Product._meta.db_table)
+    columns = ", ".join(
+        ["nutrition_grades"] + [Product._meta.get_field(n).column
+                                for n in NUTRIENTS]
+    )
+    with connection.cursor() as cursor:
+        if categories is None:
+            cursor.execute(f"SELECT DISTINCT category_id FROM {table}")
+            categories = [category for category, in cursor.fetchall()]
+        total = 0
+        for category in categories:
+            cursor.execute(
+                f"SELECT id, {columns} FROM {table} WHERE category_id = %s",
+                [category]
+            )
+            rows = cursor.fetchall()
+            ids = [row[0] for row in rows]
+            scores = compute_scores([row[1:] for row in rows]).tolist()
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"UPDATE {table} SET score = data.score "
+                    f"FROM unnest(%s::integer[], %s::smallint[]) "
+                    f"AS data(id, score) WHERE {table}.id = data.id",
+                    [ids, scores]
+                )
+            else:
+                cursor.executemany(
+                    f"UPDATE {table} SET score = %s WHERE id = %s",
+                    list(zip(scores, ids))
+                )
+            total += len(ids)
+    return total
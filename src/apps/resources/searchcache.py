@@ -0,0 +1,124 @@
+import hashlib
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from .constants import (
+    SEARCH_CACHE_MISS_TIMEOUT, SEARCH_CACHE_RESULTS, SEARCH_CACHE_TIMEOUT,
+    SEARCH_PAGE_SIZE
+)
+from .generation import catalogue_generation
+from .models import Product
+from .pagination import decode_cursor, encode_cursor, paginate
+
+
+def search_key(words, generation):
+    """
+    Get the cache key of the results of a search.
+    The key changes with the generation of the catalogue, so the
+    results of a previous catalogue are never read again and expire.
+
+    Parameters
+    ----------
+    words : str
+        Searched words, the case and the spaces are ignored.
+    generation : int
+        Generation of the catalogue.
+
+    Returns
+    -------
+    : str
+        Cache key.
+    """
+    words = " ".join(words.casefold().split())
+    digest = hashlib.sha1(words.encode("utf-8")).hexdigest()
+    return f"search:{generation}:{digest}"
+
+
+def ranked_ids(words):
+    """
+    Get the rank and the identifier of the products found by a search,
+    from the cache when the search was already made on the current
+    catalogue. A search which finds nothing is cached too.
+
+    Parameters
+    ----------
+    words : str
+        Searched words.
+
+    Returns
+    -------
+    entries, complete : tuple
+        List of (rank, id) of at most SEARCH_CACHE_RESULTS products in
+        the order of the results, and whether it holds all of them.
+    """
+    key = search_key(words, catalogue_generation())
+    cached = cache.get(key)
+    if cached is None:
+        entries = list(
+            Product.objects.search(words)
+            .annotate(cursor_rank=Cast(F("rank"), FloatField()))
+            .values_list("cursor_rank", "id")[:SEARCH_CACHE_RESULTS + 1]
+        )
+        cached = (
+            entries[:SEARCH_CACHE_RESULTS],
+            len(entries) <= SEARCH_CACHE_RESULTS
+        )
+        cache.set(
+            key,
+            cached,
+            SEARCH_CACHE_TIMEOUT if entries else SEARCH_CACHE_MISS_TIMEOUT
+        )
+    return cached
+
+
+def search(words, cursor=None, size=SEARCH_PAGE_SIZE):
+    """
+    Get a page of search results.
+    The pages are cut from the cached results, only the products of
+    the page are read from the database. The pages beyond the cached
+    results are read with `paginate`.
+
+    Parameters
+    ----------
+    words : str
+        Searched words.
+    cursor : str
+        Cursor of the last product of the previous page, None for the
+        first page.
+    size : int
+        Number of products of the page.
+
+    Returns
+    -------
+    products, next_cursor : tuple
+        Products of the page and the cursor of the next page, None if
+        it is the last page.
+
+    Raises
+    ------
+        ValueError : If the cursor is invalid.
+    """
+    entries, complete = ranked_ids(words)
+    start = 0
+    if cursor:
+        rank, pk = decode_cursor(cursor)
+        start = bisect_right([(-r, i) for r, i in entries], (-rank, pk))
+    page = entries[start:start + size + 1]
+    if not complete and len(page) <= size:
+        return paginate(Product.objects.search(words), cursor, size)
+    products = Product.objects.in_bulk([pk for _, pk in page[:size]])
+    results = []
+    for rank, pk in page[:size]:
+        # A product deleted since the search is left out.
+        if pk in products:
+            product = products[pk]
+            product.rank = product.cursor_rank = rank
+            results.append(product)
+    if len(page) > size:
+        last = Product(pk=page[size - 1][1])
+        last.cursor_rank = page[size - 1][0]
+        return results, encode_cursor(last)
+    return results, None
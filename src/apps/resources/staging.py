@@ -0,0 +1,287 @@
+import re
+
+from django.db import transaction
+
+from .loaders import load_products
+from .models import Category, Product, ProductSubstitute
+
+# Suffix of the shadow tables.
+STAGING_SUFFIX = "_staging"
+INDEX_DEFINITION = re.compile(
+    r"^(CREATE (?:UNIQUE )?INDEX )(\S+)( ON (?:ONLY )?)(\S+)( USING .*)$"
+)
+
+
+class StagingCatalogue:
+    """
+    Shadow copy of the catalogue tables on PostgreSQL.
+
+    The catalogue is loaded into empty copies of the category, product
+    and substitute tables while the site keeps serving the live tables. The
+    indexes and constraints are built once the copies are loaded, then
+    the copies replace the live tables in a single transaction so the
+    readers see either the old or the new catalogue, never a partial
+    one.
+
+    Parameters
+    ----------
+    connection : DatabaseWrapper
+        PostgreSQL connection.
+    """
+    models = (Category, Product, ProductSubstitute)
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.tables = {
+            model: f"{model._meta.db_table}{STAGING_SUFFIX}"
+            for model in self.models
+        }
+        # Objects built on the shadow tables and the name they must take
+        # once swapped: (kind, model, temporary name, final name).
+        self.renames = []
+
+    def quote(self, name):
+        return self.connection.ops.quote_name(name)
+
+    def execute(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description is not None:
+                return cursor.fetchall()
+
+    def create(self):
+        """
+        Create empty shadow tables with the columns, defaults and
+        triggers of the live tables.
+        The defaults share the sequences of the live tables, so the new
+        rows never reuse an identifier of the current catalogue.
+        """
+        for model, staging in self.tables.items():
+            live = model._meta.db_table
+            self.execute(f"DROP TABLE IF EXISTS {self.quote(staging)} CASCADE")
+            self.execute(
+                f"CREATE TABLE {self.quote(staging)} (LIKE {self.quote(live)} "
+                f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)"
+            )
+            # Triggers must fire while the rows are loaded.
+            triggers = self.execute(
+                "SELECT pg_get_triggerdef(oid) FROM pg_trigger "
+                "WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+                [live]
+            )
+            for definition, in triggers:
+                self.execute(self.retarget(definition))
+
+    def retarget(self, definition):
+        """
+        Make a definition which refers to the live tables refer to the
+        shadow tables.
+        """
+        for model, staging in self.tables.items():
+            definition = re.sub(
+                r"\b((?:public\.)?){}\b(?!{})".format(
+                    re.escape(model._meta.db_table), re.escape(STAGING_SUFFIX)
+                ),
+                r"\g<1>" + staging,
+                definition
+            )
+        return definition
+
+    def insert_category(self, name):
+        """
+        Insert a category into the shadow table.
+
+        Parameters
+        ----------
+        name : str
+            Name of the category.
+
+        Returns
+        -------
+        : Category
+            Unsaved category with the identifier of the inserted row.
+        """
+        (pk,), = self.execute(
+            f"INSERT INTO {self.quote(self.tables[Category])} (name) "
+            f"VALUES (%s) RETURNING id",
+            [name]
+        )
+        return Category(pk=pk, name=name)
+
+    def load_products(self, products):
+        """
+        Insert products into the shadow table.
+        """
+        return load_products(products, table=self.tables[Product])
+
+    def build_indexes(self):
+        """
+        Build the indexes and constraints of the live tables on the
+        loaded shadow tables.
+        """
+        for model, staging in self.tables.items():
+            live = model._meta.db_table
+            rows = self.execute(
+                "SELECT c.relname, pg_get_indexdef(i.indexrelid), "
+                "con.conname, con.contype "
+                "FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid "
+                "AND con.conrelid = i.indrelid "
+                "WHERE i.indrelid = %s::regclass ORDER BY c.relname",
+                [live]
+            )
+            for number, row in enumerate(rows):
+                name, definition, constraint, kind = row
+                temporary = f"{staging}_idx_{number}"
+                match = INDEX_DEFINITION.match(definition)
+                self.execute(
+                    f"{match.group(1)}{self.quote(temporary)}{match.group(3)}"
+                    f"{self.quote(staging)}{match.group(5)}"
+                )
+                if kind in ("p", "u"):
+                    # The index becomes the index of the constraint and
+                    # takes its name.
+                    self.execute(
+                        f"ALTER TABLE {self.quote(staging)} "
+                        f"ADD CONSTRAINT {self.quote(temporary)} "
+                        f"{'PRIMARY KEY' if kind == 'p' else 'UNIQUE'} "
+                        f"USING INDEX {self.quote(temporary)}"
+                    )
+                    self.renames.append(
+                        ("CONSTRAINT", model, temporary, constraint)
+                    )
+                else:
+                    self.renames.append(("INDEX", model, temporary, name))
+            foreign_keys = self.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f' "
+                "ORDER BY conname",
+                [live]
+            )
+            for number, (name, definition) in enumerate(foreign_keys):
+                temporary = f"{staging}_fk_{number}"
+                self.execute(
+                    f"ALTER TABLE {self.quote(staging)} "
+                    f"ADD CONSTRAINT {self.quote(temporary)} "
+                    f"{self.retarget(definition)}"
+                )
+                self.renames.append(("CONSTRAINT", model, temporary, name))
+            self.execute(f"ANALYZE {self.quote(staging)}")
+
+    def swap(self):
+        """
+        Replace the live tables by the shadow tables and drop the old
+        catalogue.
+        The foreign keys of the other tables which refer to the
+        catalogue are moved to the new tables, their rows which refer to
+        a deleted row are set to NULL when the column allows it and
+        deleted otherwise.
+        """
+        self.build_indexes()
+        with transaction.atomic(using=self.connection.alias):
+            # Check now the deferred constraints of rows written earlier
+            # in the transaction, a table can't be dropped otherwise.
+            self.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            # Lock the live tables for the time of the swap only.
+            self.execute(
+                "LOCK TABLE {} IN ACCESS EXCLUSIVE MODE".format(
+                    ", ".join(
+                        self.quote(m._meta.db_table) for m in self.models
+                    )
+                )
+            )
+            references = self.execute(
+                "SELECT con.conrelid::regclass::text, con.conname, "
+                "pg_get_constraintdef(con.oid), a.attname, a.attnotnull, "
+                "con.confrelid::regclass::text, ref.attname "
+                "FROM pg_constraint con "
+                "JOIN pg_attribute a ON a.attrelid = con.conrelid "
+                "AND a.attnum = con.conkey[1] "
+                "JOIN pg_attribute ref ON ref.attrelid = con.confrelid "
+                "AND ref.attnum = con.confkey[1] "
+                "WHERE con.contype = 'f' "
+                "AND con.confrelid = ANY(%s::regclass[]) "
+                "AND NOT con.conrelid = ANY(%s::regclass[])",
+                [
+                    [m._meta.db_table for m in self.models],
+                    [m._meta.db_table for m in self.models]
+                ]
+            )
+            for table, name, *_ in references:
+                self.execute(
+                    f"ALTER TABLE {table} DROP CONSTRAINT {self.quote(name)}"
+                )
+            sequences = []
+            for model, staging in self.tables.items():
+                live = model._meta.db_table
+                for field in model._meta.concrete_fields:
+                    (sequence,), = self.execute(
+                        "SELECT pg_get_serial_sequence(%s, %s)",
+                        [live, field.column]
+                    )
+                    if sequence:
+                        sequences.append((sequence, live, field.column))
+                self.execute(
+                    f"ALTER TABLE {self.quote(live)} "
+                    f"RENAME TO {self.quote(live + '_old')}"
+                )
+                self.execute(
+                    f"ALTER TABLE {self.quote(staging)} "
+                    f"RENAME TO {self.quote(live)}"
+                )
+            for sequence, live, column in sequences:
+                self.execute(
+                    f"ALTER SEQUENCE {sequence} "
+                    f"OWNED BY {self.quote(live)}.{self.quote(column)}"
+                )
+            for model in reversed(self.models):
+                self.execute(
+                    "DROP TABLE {} CASCADE".format(
+                        self.quote(model._meta.db_table + "_old")
+                    )
+                )
+            for kind, model, temporary, name in self.renames:
+                table = self.quote(model._meta.db_table)
+                if kind == "INDEX":
+                    self.execute(
+                        f"ALTER INDEX {self.quote(temporary)} "
+                        f"RENAME TO {self.quote(name)}"
+                    )
+                else:
+                    self.execute(
+                        f"ALTER TABLE {table} RENAME CONSTRAINT "
+                        f"{self.quote(temporary)} TO {self.quote(name)}"
+                    )
+            for reference in references:
+                table, name, definition, column, not_null = reference[:5]
+                target, target_column = reference[5:]
+                orphans = (
+                    "{column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM "
+                    "{target} WHERE {target}.{target_column} = "
+                    "{table}.{column})".format(
+                        table=table,
+                        column=self.quote(column),
+                        target=target,
+                        target_column=self.quote(target_column)
+                    )
+                )
+                if not_null:
+                    self.execute(f"DELETE FROM {table} WHERE {orphans}")
+                else:
+                    self.execute(
+                        f"UPDATE {table} SET {self.quote(column)} = NULL "
+                        f"WHERE {orphans}"
+                    )
+                self.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {self.quote(name)} "
+                    f"{definition}"
+                )
+        self.renames = []
+
+    def drop(self):
+        """
+        Drop the shadow tables, e.g. after a failed load.
+        """
+        for staging in self.tables.values():
+            self.execute(f"DROP TABLE IF EXISTS {self.quote(staging)} CASCADE")
@@ -0,0 +1,99 @@
+from array import array
+
+import numpy as np
+
+from .constants import SUBSTITUTES_LIMIT
+from .generation import CatalogueIndex
+from .models import Product
+
+
+class SubstituteIndex:
+    """
+    Columns of the scored products sorted by category, score and
+    identifier, searched by bisection.
+
+    Each product takes 18 bytes: its identifier, category and score,
+    and its position and identifier in the order of the identifiers.
+
+    Parameters
+    ----------
+    products : iterable
+        Identifier, category identifier and score of each product,
+        sorted by category, score and identifier.
+    """
+    def __init__(self, products):
+        # The rows are gathered in compact arrays rather than lists of
+        # Python integers.
+        ids, categories, scores = array("l"), array("l"), array("l")
+        for pk, category, score in products:
+            ids.append(pk)
+            categories.append(category)
+            scores.append(score)
+        self.ids = np.array(ids, dtype=np.int32)
+        self.categories = np.array(categories, dtype=np.int32)
+        self.scores = np.array(scores, dtype=np.int16)
+        # Positions of the products in the order of their identifier.
+        self.by_id = np.argsort(self.ids, kind="stable").astype(np.int32)
+        self.sorted_ids = self.ids[self.by_id]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, product_id):
+        """
+        Get the position of a product, None if it isn't indexed.
+        """
+        index = np.searchsorted(self.sorted_ids, product_id)
+        if index < len(self.sorted_ids) and \
+                self.sorted_ids[index] == product_id:
+            return int(self.by_id[index])
+        return None
+
+    def substitutes(self, product_id, limit=SUBSTITUTES_LIMIT):
+        """
+        Get the best products of the category of a product which are
+        strictly better than it.
+
+        Parameters
+        ----------
+        product_id : int
+            Product identifier.
+        limit : int
+            Maximum number of substitutes.
+
+        Returns
+        -------
+        : list
+            Identifiers of the substitutes, the best first.
+        """
+        position = self.position(product_id)
+        if position is None:
+            return []
+        category = self.categories[position]
+        start = np.searchsorted(self.categories, category, side="left")
+        end = np.searchsorted(self.categories, category, side="right")
+        # The better products come first in the category.
+        better = np.searchsorted(
+            self.scores[start:end], self.scores[position], side="left"
+        )
+        return self.ids[start:start + min(better, limit)].tolist()
+
+
+class SubstituteEngine(CatalogueIndex):
+    """
+    Substitute index of the current catalogue.
+    """
+    def build_index(self):
+        products = Product.objects\
+            .exclude(score=None)\
+            .order_by("category_id", "score", "id")\
+            .values_list("id", "category_id", "score")\
+            .iterator(chunk_size=10000)
+        return SubstituteIndex(products)
+
+    def substitutes(self, product_id, limit=SUBSTITUTES_LIMIT):
+        return self.get_index().substitutes(product_id, limit)
+
+
+# Index of the current process.
+substitute_engine = SubstituteEngine()
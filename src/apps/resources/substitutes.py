@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .constants import SUBSTITUTES_LIMIT
+from .models import Product, ProductSubstitute
+
+# The substitutes of a product are the best products of its category
+# which are strictly better than it. They are the products of the
+# category ranked in the first SUBSTITUTES_LIMIT whose score is lower
+# than the score of the product, as the products better than it come
+# first in the category.
+INSERT_SUBSTITUTES = """
+INSERT INTO {substitutes} (product_id, substitute_id, rank)
+SELECT product.id, best.id, best.position
+FROM {products} product
+JOIN (
+    SELECT id, category_id, score, ROW_NUMBER() OVER (
+        PARTITION BY category_id ORDER BY score, id
+    ) AS position
+    FROM {products}
+    WHERE score IS NOT NULL {categories}
+) best ON best.category_id = product.category_id
+    AND best.position <= %s
+    AND best.score < product.score
+WHERE product.score IS NOT NULL {product_categories}
+"""
+
+
+def analyze(cursor, table):
+    """
+    Update the statistics of a freshly loaded product table on
+    PostgreSQL, without which the planner joins the products with the
+    best products of their category in a nested loop.
+    """
+    if cursor.db.vendor == "postgresql":
+        cursor.execute(f"ANALYZE {table}")
+
+
+def refresh_substitutes(tables=None, categories=None, using=DEFAULT_DB_ALIAS):
+    """
+    Store the substitutes of the products.
+    The substitutes are replaced in a single transaction, so the
+    readers see either the previous or the new substitutes of a
+    product.
+
+    Parameters
+    ----------
+    tables : dict
+        Table of the Product and ProductSubstitute models, their own
+        tables by default.
+    categories : list
+        Identifiers of the categories whose products are refreshed, all
+        the categories by default.
+    using : str
+        Alias of the database.
+
+    Returns
+    -------
+    : int
+        Number of substitutes stored.
+    """
+    connection = connections[using]
+    tables = tables or {}
+    products, substitutes = (
+        connection.ops.quote_name(
+            tables.get(model, model._meta.db_table)
+        )
+        for model in (Product, ProductSubstitute)
+    )
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        if categories is None:
+            analyze(cursor, products)
+            cursor.execute(f"DELETE FROM {substitutes}")
+            params, where = [SUBSTITUTES_LIMIT], ""
+        else:
+            categories = list(categories)
+            if not categories:
+                return 0
+            cursor.execute(
+                f"DELETE FROM {substitutes} WHERE product_id IN ("
+                f"SELECT id FROM {products} WHERE category_id IN "
+                f"({', '.join(['%s'] * len(categories))}))",
+                categories
+            )
+            where = "AND category_id IN ({})".format(
+                ", ".join(["%s"] * len(categories))
+            )
+            params = categories + [SUBSTITUTES_LIMIT] + categories
+        cursor.execute(
+            INSERT_SUBSTITUTES.format(
+                substitutes=substitutes,
+                products=products,
+                categories=where,
+                product_categories=where.replace(
+                    "category_id", "product.category_id"
+                )
+            ),
+            params
+        )
+        return cursor.rowcount
+
+
+def refresh_all_substitutes(tables=None, workers=1, using=DEFAULT_DB_ALIAS,
+                            categories=None):
+    """
+    Store the substitutes of every product, the categories being split
+    between several connections. Each connection replaces the
+    substitutes of its categories in a single transaction.
+
+    Parameters
+    ----------
+    tables : dict
+        Table of the Product and ProductSubstitute models, their own
+        tables by default.
+    workers : int
+        Number of categories refreshed at the same time.
+    using : str
+        Alias of the database.
+    categories : list
+        Identifiers of the categories whose products are refreshed, all
+        the categories by default.
+
+    Returns
+    -------
+    : int
+        Number of substitutes stored.
+    """
+    if workers <= 1:
+        return refresh_substitutes(tables, categories, using)
+    connection = connections[using]
+    products = connection.ops.quote_name(
+        (tables or {}).get(Product, Product._meta.db_table)
+    )
+    with connection.cursor() as cursor:
+        analyze(cursor, products)
+        if categories is None:
+            cursor.execute(f"SELECT DISTINCT category_id FROM {products}")
+            categories = [category for category, in cursor.fetchall()]
+    categories = sorted(categories)
+
+    def refresh(shard):
+        try:
+            return refresh_substitutes(tables, shard, using)
+        finally:
+            # Each thread has its own connection.
+            connections[using].close()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(
+            refresh, [categories[i::workers] for i in range(workers)]
+        ))
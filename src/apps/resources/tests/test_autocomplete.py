@@ -0,0 +1,123 @@
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.resources.autocomplete import Autocomplete, PrefixIndex, normalize
+from apps.resources.constants import AUTOCOMPLETE_MIN_LENGTH
+from apps.resources.generation import (
+    catalogue_generation, expire_generation, publish_generation
+)
+from apps.resources.models import Category, Product, SyncRun
+
+
+def create_products(*names):
+    category = Category.objects.get_or_create(name="category_a")[0]
+    Product.objects.bulk_create(
+        Product(
+            product_name=name,
+            code=str(index),
+            nutrition_grades="a",
+            category=category
+        )
+        for index, name in enumerate(names)
+    )
+
+
+def publish_catalogue():
+    run = SyncRun.objects.create(
+        status=SyncRun.DONE, finished_at=timezone.now()
+    )
+    publish_generation(run.pk)
+
+
+class PrefixIndexTest(TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize("  Pâte  à TARTINER "), "pate a tartiner")
+
+    def test_complete(self):
+        index = PrefixIndex([
+            (1, "Nutella"), (2, "Pâte à tartiner"), (3, "nutella"),
+            (4, "Nutri-Score"), (5, "Pates")
+        ])
+        self.assertEqual(
+            index.complete("nut"), [(1, "Nutella"), (4, "Nutri-Score")]
+        )
+        self.assertEqual(
+            index.complete("PÂTE"), [(2, "Pâte à tartiner"), (5, "Pates")]
+        )
+        self.assertEqual(index.complete("nut", limit=1), [(1, "Nutella")])
+        self.assertEqual(index.complete("xyz"), [])
+
+    def test_complete_a_large_catalogue(self):
+        index = PrefixIndex(
+            (pk, f"produit {pk * 7919 % 200000}") for pk in range(200000)
+        )
+        durations = []
+        for pk in range(1000):
+            start = time.perf_counter()
+            index.complete(f"produit {pk}")
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        self.assertLess(durations[int(len(durations) * 0.99)], 0.005)
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        expire_generation()
+
+    def test_generation_changes_with_the_catalogue(self):
+        self.assertEqual(catalogue_generation(), 0)
+        publish_catalogue()
+        self.assertNotEqual(catalogue_generation(), 0)
+
+    def test_index_is_rebuilt_for_a_new_generation(self):
+        autocomplete = Autocomplete(background=False)
+        create_products("Nutella")
+        self.assertEqual(len(autocomplete.complete("nut")), 1)
+        create_products("Nutri-Score")
+        # Same generation: the index is kept.
+        self.assertEqual(len(autocomplete.complete("nut")), 1)
+        publish_catalogue()
+        self.assertEqual(len(autocomplete.complete("nut")), 2)
+
+    @patch("apps.resources.generation.threading.Thread")
+    def test_first_index_is_built_in_the_background(self, thread):
+        autocomplete = Autocomplete()
+        create_products("Nutella")
+        # No suggestion until the first index is built.
+        self.assertEqual(autocomplete.complete("nut"), [])
+        self.assertEqual(autocomplete.complete("nut"), [])
+        thread.assert_called_once()
+        autocomplete.build(*thread.call_args[1]["args"])
+        self.assertEqual(len(autocomplete.complete("nut")), 1)
+
+    def test_minimum_length_is_given_to_the_script(self):
+        response = self.client.get(reverse("core:home"))
+        self.assertContains(
+            response,
+            f'data-autocomplete-min-length="{AUTOCOMPLETE_MIN_LENGTH}"'
+        )
+
+    def test_view(self):
+        create_products("Nutella", "Nutri-Score", "Pâte à tartiner")
+        url = reverse("resources:products_autocomplete")
+        with patch(
+            "apps.resources.views.autocomplete", Autocomplete(background=False)
+        ):
+            response = self.client.get(url, {"q": "nut"})
+            self.assertEqual(
+                [p["product_name"] for p in response.json()["results"]],
+                ["Nutella", "Nutri-Score"]
+            )
+            # The suggestions are answered without the database.
+            with self.assertNumQueries(0):
+                response = self.client.get(url, {"q": "pâ"})
+            self.assertEqual(len(response.json()["results"]), 1)
+            with self.assertNumQueries(0):
+                response = self.client.get(url, {"q": "n"})
+            self.assertEqual(response.json()["results"], [])
@@ -0,0 +1,665 @@
+import gzip
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from apps.resources.constants import CATEGORIES_URL
+from apps.resources.management.commands.sync_database import Command
+from apps.resources.models import (
+    BackupProduct, Category, Product, ProductSubstitute, SyncRun
+)
+from apps.resources.substitutes import refresh_substitutes
+from .utils import credentials
+
+
+def fake_catalogue(nb_category, nb_product):
+    """
+    Build the pages served by a fake Open Food Facts.
+
+    Parameters
+    ----------
+    nb_category : int
+        Number of categories.
+    nb_product : int
+        Number of products per category.
+
+    Returns
+    -------
+    pages : dict
+        Decoded JSON content of each page by url.
+    """
+    pages = {CATEGORIES_URL: {"tags": []}}
+    for c in range(nb_category):
+        url = f"https://off.test/category/category-{c}"
+        pages[CATEGORIES_URL]["tags"].append(
+            {"name": f"category_{c}", "url": url, "products": nb_product}
+        )
+        for index in range(nb_product):
+            page = pages.setdefault(
+                f"{url}/{index // 20 + 1}.json", {"products": []}
+            )
+            page["products"].append({
+                "product_name": f"product_{c}_{index}",
+                "code": f"{c:04}{index:08}",
+                "image_url": "https://off.test/image.jpg",
+                "url": f"https://off.test/product/{c}/{index}",
+                "nutrient_levels": {
+                    "salt": "low",
+                    "fat": "moderate",
+                    "sugars": "high",
+                    "saturated-fat": "low"
+                },
+                "brands": "brand",
+                "allergens": "",
+                "nutrition_grades": "abcde"[index % 5]
+            })
+    return pages
+
+
+def fake_session(pages):
+    """
+    Build a requests session answering with the given pages.
+    """
+    def get(url, **kwargs):
+        response = MagicMock(status_code=200, headers={})
+        response.text = json.dumps(pages[url])
+        return response
+
+    session = MagicMock()
+    session.get.side_effect = get
+    return session
+
+
+class SyncDatabaseCommandTest(TestCase):
+    def sync(self, pages, *args):
+        session = fake_session(pages)
+        with patch("requests.Session", return_value=session):
+            call_command("sync_database", *args, stdout=StringIO())
+        return session
+
+    def test_sync_inserts_categories_and_products(self):
+        self.sync(fake_catalogue(3, 45))
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 3 * 45)
+
+    def test_sync_fetch_every_page(self):
+        session = self.sync(fake_catalogue(2, 45), "--fetch-workers", "4")
+        urls = [c[0][0] for c in session.get.call_args_list]
+        self.assertEqual(len(urls), 1 + 2 * 3)
+
+    def test_downloads_are_bounded(self):
+        command = Command()
+        downloaded = []
+
+        def download(url):
+            downloaded.append(url)
+            return url, True
+
+        command.download = download
+        urls = [f"https://off.test/{page}.json" for page in range(50)]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            pages = command.prefetch(executor, urls, window=4)
+            self.assertEqual(next(pages), (urls[0], True))
+            self.assertLessEqual(len(downloaded), 5)
+            self.assertEqual([url for url, _ in pages], urls[1:])
+
+    def test_sync_order_is_deterministic(self):
+        self.sync(fake_catalogue(4, 30), "--fetch-workers", "8")
+        self.assertEqual(
+            list(
+                Category.objects.order_by("id").values_list("name", flat=True)
+            ),
+            [f"category_{c}" for c in range(4)]
+        )
+        self.assertEqual(
+            list(
+                Product.objects.order_by("id").values_list("code", flat=True)
+            ),
+            [f"{c:04}{index:08}" for c in range(4) for index in range(30)]
+        )
+
+    def test_truncate_tables_doesnt_collect_the_rows(self):
+        self.sync(fake_catalogue(2, 45))
+        refresh_substitutes()
+        product = Product.objects.select_related("category").first()
+        saved = BackupProduct.objects.create(
+            product_code=product.code,
+            category_name=product.category.name,
+            user=User.objects.create_user(**credentials),
+            product=product,
+            snapshot=BackupProduct.snapshot_of(product)
+        )
+        # One query unlinks the saved products, one per table deletes.
+        with self.assertNumQueries(4):
+            Command(stdout=StringIO()).truncate_tables()
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Category.objects.exists())
+        self.assertFalse(ProductSubstitute.objects.exists())
+        saved.refresh_from_db()
+        self.assertIsNone(saved.product)
+
+    def test_sync_replaces_previous_data(self):
+        self.sync(fake_catalogue(2, 25))
+        self.sync(fake_catalogue(1, 25))
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(Product.objects.count(), 25)
+
+    def test_sync_fetch_the_last_incomplete_page(self):
+        session = self.sync(fake_catalogue(1, 41))
+        urls = [c[0][0] for c in session.get.call_args_list]
+        self.assertEqual(
+            urls[-1], "https://off.test/category/category-0/3.json"
+        )
+        self.assertEqual(Product.objects.count(), 41)
+
+    def test_sync_limits(self):
+        session = self.sync(
+            fake_catalogue(4, 100), "--max-categories", "3",
+            "--max-products", "30"
+        )
+        self.assertEqual(session.get.call_count, 1 + 3 * 2)
+        self.assertEqual(Category.objects.count(), 3)
+        # The last page is cut to the limit.
+        for category in Category.objects.all():
+            self.assertLessEqual(
+                Product.objects.filter(category=category).count(), 30
+            )
+        self.assertEqual(Product.objects.count(), 3 * 30)
+
+    @override_settings(SYNC_MAX_CATEGORIES=2, SYNC_MAX_PRODUCTS=20)
+    def test_sync_limits_from_settings(self):
+        self.sync(fake_catalogue(3, 45))
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Product.objects.count(), 2 * 20)
+
+    def test_sync_tier(self):
+        self.sync(fake_catalogue(60, 20), "--tier", "10k")
+        self.assertEqual(Category.objects.count(), 50)
+
+    def test_workers_need_a_shared_database(self):
+        with self.assertRaises(CommandError):
+            self.sync({}, "--workers", "2", "--from-file", "products.jsonl")
+
+
+class IncrementalSyncDatabaseCommandTest(TestCase):
+    def sync(self, pages, *args):
+        out = StringIO()
+        with patch("requests.Session", return_value=fake_session(pages)):
+            call_command("sync_database", *args, stdout=out)
+        return out.getvalue()
+
+    def test_incremental_sync_keeps_primary_keys(self):
+        self.sync(fake_catalogue(2, 45))
+        ids = dict(Product.objects.values_list("code", "id"))
+        self.sync(fake_catalogue(2, 45), "--incremental")
+        self.assertEqual(dict(Product.objects.values_list("code", "id")), ids)
+
+    def test_incremental_sync_without_change_writes_nothing(self):
+        self.sync(fake_catalogue(2, 45))
+        out = self.sync(fake_catalogue(2, 45), "--incremental")
+        self.assertEqual(
+            out.count("0 produit(s) ajouté(s), 0 mis à jour, 0 supprimé(s)."),
+            2
+        )
+        # Neither the scores nor the substitutes are computed again.
+        self.assertIn("0 produits notés.", out)
+        self.assertIn("0 substituts calculés", out)
+
+    def test_incremental_sync_applies_the_difference(self):
+        self.sync(fake_catalogue(2, 45))
+        pages = fake_catalogue(3, 45)
+        first_page = pages["https://off.test/category/category-0/1.json"]
+        # Update a product and remove another one.
+        first_page["products"][0]["product_name"] = "updated"
+        removed = first_page["products"].pop()
+        ids = dict(Product.objects.values_list("code", "id"))
+        out = self.sync(pages, "--incremental")
+        self.assertIn(
+            "0 produit(s) ajouté(s), 1 mis à jour, 1 supprimé(s).", out
+        )
+        self.assertIn(
+            "45 produit(s) ajouté(s), 0 mis à jour, 0 supprimé(s).", out
+        )
+        updated = Product.objects.get(product_name="updated")
+        self.assertEqual(updated.id, ids[updated.code])
+        self.assertFalse(Product.objects.filter(code=removed["code"]).exists())
+        self.assertEqual(Product.objects.count(), 3 * 45 - 1)
+        # Only the changed categories are scored and refreshed, and they
+        # end with the substitutes of a whole refresh.
+        self.assertIn(f"{2 * 45 - 1} produits notés.", out)
+        substitutes = list(
+            ProductSubstitute.objects.order_by("product", "rank")
+            .values_list("product", "substitute")
+        )
+        self.assertTrue(substitutes)
+        refresh_substitutes()
+        self.assertEqual(
+            list(
+                ProductSubstitute.objects.order_by("product", "rank")
+                .values_list("product", "substitute")
+            ),
+            substitutes
+        )
+
+    def test_resumed_incremental_sync_scores_the_changed_categories(self):
+        self.sync(fake_catalogue(2, 45))
+        pages = fake_catalogue(3, 45)
+        first_page = pages["https://off.test/category/category-0/1.json"]
+        first_page["products"][0]["product_name"] = "updated"
+        del pages["https://off.test/category/category-2/1.json"]
+        with self.assertRaises(KeyError):
+            self.sync(pages, "--incremental")
+        run = SyncRun.objects.order_by("-id").first()
+        self.assertEqual(run.category_index, 2)
+        self.assertEqual(
+            json.loads(run.changed_categories),
+            [Category.objects.get(name="category_0").pk]
+        )
+        pages = fake_catalogue(3, 45)
+        pages["https://off.test/category/category-0/1.json"] = first_page
+        out = self.sync(pages, "--resume")
+        # The category changed before the failure is scored with the
+        # category synchronised by the resumed run.
+        self.assertIn(f"{2 * 45} produits notés.", out)
+
+    def test_incremental_sync_deletes_old_categories(self):
+        self.sync(fake_catalogue(3, 45))
+        pages = fake_catalogue(3, 45)
+        pages[CATEGORIES_URL]["tags"].pop(0)
+        self.sync(pages, "--incremental")
+        self.assertFalse(Category.objects.filter(name="category_0").exists())
+        self.assertEqual(Product.objects.count(), 2 * 45)
+
+
+class FileSyncDatabaseCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.products = [
+            {
+                "code": f"{index:013}",
+                "product_name": f"product_{index}",
+                "categories": f"category_{index % 3}, sub-category",
+                "image_url": "https://off.test/image.jpg",
+                "url": f"https://off.test/product/{index}",
+                "brands": "brand",
+                "allergens": "en:milk",
+                "nutrition_grades": "abcde"[index % 5],
+                "nutrient_levels": {"salt": "low", "fat": "high"}
+            }
+            for index in range(30)
+        ]
+        # Products which can't be imported.
+        self.products += [
+            {"code": "1", "product_name": "no category",
+             "nutrition_grades": "a"},
+            {"code": "2", "product_name": "no grade",
+             "categories": "category_0", "nutrition_grades": "unknown"},
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sync(self, path):
+        with patch("requests.Session", side_effect=AssertionError):
+            call_command(
+                "sync_database", "--from-file", path, stdout=StringIO()
+            )
+
+    def test_sync_from_jsonl_file(self):
+        path = os.path.join(self.directory.name, "products.jsonl")
+        with open(path, "w") as f:
+            f.writelines(json.dumps(p) + "\n" for p in self.products)
+        self.sync(path)
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 30)
+        product = Product.objects.get(code=f"{4:013}")
+        self.assertEqual(product.category.name, "category_1")
+        self.assertEqual(product.nutrition_grades, "e")
+        self.assertEqual(product.salt, "low")
+        self.assertEqual(product.warehouse, "brand")
+
+    def test_sync_from_gzip_csv_file(self):
+        path = os.path.join(self.directory.name, "products.csv.gz")
+        columns = (
+            "code", "product_name", "categories", "brands",
+            "nutriscore_grade", "salt_100g", "fat_100g", "sugars_100g"
+        )
+        with gzip.open(path, "wt") as f:
+            f.write("\t".join(columns) + "\n")
+            f.write("42\tnutella\tPâtes à tartiner\tFerrero\te\t0.1\t31\t\n")
+            f.write("43\tno grade\tPâtes à tartiner\tFerrero\t\t0.1\t31\t\n")
+        self.sync(path)
+        product = Product.objects.get()
+        self.assertEqual(product.product_name, "nutella")
+        self.assertEqual(product.category.name, "Pâtes à tartiner")
+        self.assertEqual(product.warehouse, "Ferrero")
+        self.assertEqual(product.salt, "low")
+        self.assertEqual(product.fat, "high")
+        self.assertIsNone(product.sugars)
+
+    def test_sync_from_file_replaces_previous_data(self):
+        category = Category.objects.create(name="old")
+        path = os.path.join(self.directory.name, "products.jsonl")
+        with open(path, "w") as f:
+            f.writelines(json.dumps(p) + "\n" for p in self.products)
+        self.sync(path)
+        self.assertFalse(Category.objects.filter(pk=category.pk).exists())
+
+    def test_bad_file_keeps_the_current_catalogue(self):
+        path = os.path.join(self.directory.name, "products.jsonl")
+        with open(path, "w") as f:
+            f.writelines(json.dumps(p) + "\n" for p in self.products)
+        self.sync(path)
+        ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+        with open(path, "a") as f:
+            f.write("{not json\n")
+        missing = os.path.join(self.directory.name, "missing.jsonl")
+        for bad_path in (path, missing):
+            with self.assertRaises(CommandError):
+                self.sync(bad_path)
+            self.assertEqual(
+                list(
+                    Product.objects.order_by("id").values_list("id", flat=True)
+                ),
+                ids
+            )
+            self.assertEqual(
+                SyncRun.objects.order_by("-id").first().status,
+                SyncRun.FAILED
+            )
+
+
+class SwapSyncDatabaseCommandTest(TestCase):
+    def sync(self, pages, *args):
+        with patch("requests.Session", return_value=fake_session(pages)):
+            call_command("sync_database", *args, stdout=StringIO())
+
+    def constraints(self):
+        with connection.cursor() as cursor:
+            return {
+                table: sorted(
+                    connection.introspection.get_constraints(cursor, table)
+                )
+                for table in ("resources_category", "resources_product")
+            }
+
+    def test_swap_replaces_the_catalogue(self):
+        self.sync(fake_catalogue(2, 45))
+        self.sync(fake_catalogue(3, 45), "--swap")
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 3 * 45)
+        self.assertEqual(
+            Product.objects.filter(category__name="category_2").count(), 45
+        )
+
+    def test_swap_keeps_constraints_and_sequences(self):
+        self.sync(fake_catalogue(1, 45))
+        constraints = self.constraints()
+        last_id = Product.objects.order_by("id").last().id
+        self.sync(fake_catalogue(1, 45), "--swap")
+        self.assertEqual(self.constraints(), constraints)
+        # Identifiers of the old catalogue are never reused.
+        self.assertGreater(Product.objects.order_by("id").first().id, last_id)
+        product = Product.objects.create(
+            product_name="new", code="1", nutrition_grades="a",
+            category=Category.objects.first()
+        )
+        self.assertGreater(product.id, Product.objects.exclude(
+            pk=product.pk).order_by("id").last().id)
+
+    def test_swap_links_the_saved_products(self):
+        self.sync(fake_catalogue(1, 45))
+        product = Product.objects.select_related("category").first()
+        snapshot = BackupProduct.snapshot_of(product)
+        saved = BackupProduct.objects.create(
+            product_code=product.code,
+            category_name=product.category.name,
+            user=User.objects.create_user(**credentials),
+            product=product,
+            snapshot=snapshot
+        )
+        self.sync(fake_catalogue(1, 45), "--swap")
+        saved.refresh_from_db()
+        self.assertNotEqual(saved.product_id, product.id)
+        self.assertEqual(saved.product.code, product.code)
+        self.assertEqual(saved.snapshot, snapshot)
+
+    def test_failed_swap_keeps_the_current_catalogue(self):
+        self.sync(fake_catalogue(2, 45))
+        ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+        pages = fake_catalogue(3, 45)
+        del pages["https://off.test/category/category-2/2.json"]
+        with self.assertRaises(KeyError):
+            self.sync(pages, "--swap")
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list("id", flat=True)),
+            ids
+        )
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        self.assertNotIn("resources_product_staging", tables)
+
+    def test_swap_with_errors_keeps_the_current_catalogue(self):
+        self.sync(fake_catalogue(2, 45))
+        ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+        with patch(
+            "apps.resources.management.commands.sync_database.Command."
+            "load_products",
+            side_effect=ValueError("invalid page")
+        ):
+            with self.assertRaises(CommandError):
+                self.sync(fake_catalogue(3, 45), "--swap")
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list("id", flat=True)),
+            ids
+        )
+        self.assertEqual(
+            SyncRun.objects.filter(status=SyncRun.DONE).count(), 1
+        )
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        self.assertNotIn("resources_product_staging", tables)
+
+    def test_swap_from_file(self):
+        self.sync(fake_catalogue(2, 45))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "products.jsonl")
+            with open(path, "w") as f:
+                f.write(json.dumps({
+                    "code": "42", "product_name": "nutella",
+                    "categories": "Pâtes à tartiner",
+                    "nutrition_grades": "e"
+                }) + "\n")
+            self.sync({}, "--swap", "--from-file", path)
+        self.assertEqual(
+            list(Product.objects.values_list("product_name", flat=True)),
+            ["nutella"]
+        )
+
+
+class ResumeSyncDatabaseCommandTest(TestCase):
+    def sync(self, pages, *args):
+        session = fake_session(pages)
+        with patch("requests.Session", return_value=session):
+            call_command("sync_database", *args, stdout=StringIO())
+        return [c[0][0] for c in session.get.call_args_list]
+
+    def fail_sync(self):
+        pages = fake_catalogue(3, 45)
+        del pages["https://off.test/category/category-1/2.json"]
+        with self.assertRaises(KeyError):
+            self.sync(pages)
+
+    def test_successful_sync_is_done(self):
+        self.sync(fake_catalogue(2, 45))
+        run = SyncRun.objects.get()
+        self.assertEqual(run.status, SyncRun.DONE)
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.category_index, 2)
+
+    def test_failed_sync_keeps_its_checkpoint(self):
+        self.fail_sync()
+        run = SyncRun.objects.get()
+        self.assertEqual(run.status, SyncRun.FAILED)
+        self.assertEqual((run.category_index, run.page), (1, 1))
+        self.assertEqual(Product.objects.count(), 45 + 20)
+
+    def test_resume_from_the_last_page(self):
+        self.fail_sync()
+        urls = self.sync(fake_catalogue(3, 45), "--resume")
+        self.assertEqual(urls, [
+            "https://off.test/category/category-1/2.json",
+            "https://off.test/category/category-1/3.json",
+            "https://off.test/category/category-2/1.json",
+            "https://off.test/category/category-2/2.json",
+            "https://off.test/category/category-2/3.json",
+        ])
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 3 * 45)
+        self.assertEqual(
+            Product.objects.values("code").distinct().count(), 3 * 45
+        )
+        self.assertEqual(SyncRun.objects.get().status, SyncRun.DONE)
+
+    def test_resume_from_a_page_which_failed_to_insert(self):
+        load_products = Command.load_products
+        calls = []
+
+        def fail_second_page(command, products):
+            calls.append(products)
+            if len(calls) == 2:
+                raise ValueError("Invalid page.")
+            return load_products(command, products)
+
+        with patch.object(Command, "load_products", fail_second_page):
+            with self.assertRaises(CommandError):
+                self.sync(fake_catalogue(2, 45))
+        run = SyncRun.objects.get()
+        self.assertEqual(run.status, SyncRun.FAILED)
+        self.assertEqual((run.category_index, run.page), (0, 1))
+        self.assertEqual(Product.objects.count(), 20)
+        self.sync(fake_catalogue(2, 45), "--resume")
+        self.assertEqual(Product.objects.count(), 2 * 45)
+        self.assertEqual(
+            Product.objects.values("code").distinct().count(), 2 * 45
+        )
+        self.assertEqual(SyncRun.objects.get().status, SyncRun.DONE)
+
+    def test_failed_swap_is_not_resumed(self):
+        self.sync(fake_catalogue(3, 45))
+        pages = fake_catalogue(3, 45)
+        del pages["https://off.test/category/category-1/2.json"]
+        with self.assertRaises(KeyError):
+            self.sync(pages, "--swap")
+        with self.assertRaises(CommandError):
+            self.sync(fake_catalogue(3, 45), "--resume")
+        self.assertEqual(Product.objects.count(), 3 * 45)
+        self.assertEqual(
+            Product.objects.values("code").distinct().count(), 3 * 45
+        )
+
+    def test_failed_file_import_is_not_resumed(self):
+        self.sync(fake_catalogue(1, 45))
+        with self.assertRaises(CommandError):
+            self.sync({}, "--from-file", "/nonexistent/products.jsonl")
+        with self.assertRaises(CommandError):
+            self.sync(fake_catalogue(1, 45), "--resume")
+        self.assertEqual(Product.objects.count(), 45)
+
+    def test_resume_with_the_same_tier(self):
+        pages = fake_catalogue(3, 45)
+        del pages["https://off.test/category/category-1/2.json"]
+        with self.assertRaises(KeyError):
+            self.sync(pages, "--tier", "10k")
+        with self.assertRaises(CommandError):
+            self.sync(fake_catalogue(3, 45), "--resume")
+        self.sync(fake_catalogue(3, 45), "--resume", "--tier", "10k")
+        self.assertEqual(Product.objects.count(), 3 * 45)
+        self.assertEqual(SyncRun.objects.get().tier, "10k")
+
+    def test_nothing_to_resume(self):
+        self.sync(fake_catalogue(1, 45))
+        with self.assertRaises(CommandError):
+            self.sync(fake_catalogue(1, 45), "--resume")
+
+    def test_resume_incremental_sync(self):
+        self.sync(fake_catalogue(3, 45))
+        ids = dict(Product.objects.values_list("code", "id"))
+        pages = fake_catalogue(3, 45)
+        del pages["https://off.test/category/category-1/2.json"]
+        with self.assertRaises(KeyError):
+            self.sync(pages, "--incremental")
+        urls = self.sync(fake_catalogue(3, 45), "--resume")
+        self.assertNotIn("https://off.test/category/category-0/1.json", urls)
+        self.assertEqual(dict(Product.objects.values_list("code", "id")), ids)
+
+
+# The processes can't share the in-memory database of the SQLite tests.
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class ParallelSyncDatabaseCommandTest(TransactionTestCase):
+    def sync(self, pages, *args):
+        out = StringIO()
+        with patch("requests.Session", return_value=fake_session(pages)):
+            call_command("sync_database", "--workers", "3", *args, stdout=out)
+        return out.getvalue()
+
+    def test_workers_synchronise_every_category(self):
+        out = self.sync(fake_catalogue(5, 45))
+        self.assertEqual(Category.objects.count(), 5)
+        self.assertEqual(Product.objects.count(), 5 * 45)
+        # The output of the categories is written in their order.
+        ids = Category.objects.order_by("name").values_list("id", flat=True)
+        positions = [out.index(f"ID #{pk}.") for pk in ids]
+        self.assertEqual(positions, sorted(positions))
+        run = SyncRun.objects.get()
+        self.assertEqual((run.status, run.category_index), (SyncRun.DONE, 5))
+
+    def test_workers_incremental_sync(self):
+        self.sync(fake_catalogue(4, 45))
+        ids = dict(Product.objects.values_list("code", "id"))
+        out = self.sync(fake_catalogue(4, 45), "--incremental")
+        self.assertEqual(out.count("0 produit(s) ajouté(s), 0 mis à jour"), 4)
+        self.assertEqual(dict(Product.objects.values_list("code", "id")), ids)
+
+    def test_workers_swap(self):
+        self.sync(fake_catalogue(2, 45))
+        self.sync(fake_catalogue(4, 45), "--swap")
+        self.assertEqual(Category.objects.count(), 4)
+        self.assertEqual(Product.objects.count(), 4 * 45)
+
+    def test_workers_swap_with_errors(self):
+        self.sync(fake_catalogue(2, 45))
+        with patch(
+            "apps.resources.management.commands.sync_database.Command."
+            "load_products",
+            side_effect=ValueError("invalid page")
+        ):
+            with self.assertRaises(CommandError):
+                self.sync(fake_catalogue(4, 45), "--swap")
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Product.objects.count(), 2 * 45)
+
+    def test_resume_failed_parallel_sync(self):
+        pages = fake_catalogue(5, 45)
+        del pages["https://off.test/category/category-1/2.json"]
+        with self.assertRaises(KeyError):
+            self.sync(pages)
+        run = SyncRun.objects.get()
+        self.assertEqual((run.status, run.category_index), (SyncRun.FAILED, 1))
+        # The failed category is rolled back as a whole.
+        self.assertFalse(Category.objects.filter(name="category_1").exists())
+        self.sync(fake_catalogue(5, 45), "--resume")
+        self.assertEqual(Category.objects.count(), 5)
+        self.assertEqual(
+            Product.objects.values("code").distinct().count(), 5 * 45
+        )
+        self.assertEqual(Product.objects.count(), 5 * 45)
@@ -0,0 +1,97 @@
+import time
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import requests
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.resources.external import external_products, fetch_product
+from apps.resources.models import ExternalProductCache
+
+
+def response(status_code=200, product=None):
+    mock = Mock(status_code=status_code)
+    mock.json.return_value = {"product": product} if product else {}
+    if status_code >= 400 and status_code != 404:
+        mock.raise_for_status.side_effect = requests.HTTPError()
+    return mock
+
+
+NUTELLA = {
+    "product_name": "Nutella",
+    "image_url": "https://example.com/nutella.jpg",
+    "url": "https://example.com/nutella",
+    "nutrient_levels": {"salt": "low", "saturated-fat": "high"},
+    "brands": "Ferrero",
+    "nutrition_grades": "e",
+}
+
+
+@patch("apps.resources.external.session")
+class ExternalProductsTest(TestCase):
+    def test_product_fields(self, session):
+        session.get.return_value = response(product=NUTELLA)
+        product = fetch_product("3017620422003")
+        self.assertEqual(product["product_name"], "Nutella")
+        self.assertEqual(product["saturated_fat"], "high")
+        self.assertEqual(product["warehouse"], "Ferrero")
+        self.assertIsNone(product["sugars"])
+        self.assertIn("timeout", session.get.call_args[1])
+
+    def test_product_is_fetched_once(self, session):
+        session.get.return_value = response(product=NUTELLA)
+        for _ in range(2):
+            products = external_products(["3017620422003"])
+            self.assertEqual(
+                products["3017620422003"]["product_name"], "Nutella"
+            )
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_unknown_product_is_cached(self, session):
+        session.get.return_value = response(404)
+        for _ in range(2):
+            self.assertEqual(external_products(["0000000000000"]), {})
+        self.assertEqual(session.get.call_count, 1)
+        self.assertIsNone(
+            ExternalProductCache.objects.get(code="0000000000000").data
+        )
+
+    def test_failures_are_retried(self, session):
+        session.get.side_effect = [
+            requests.ConnectionError(), response(500),
+            response(product=NUTELLA)
+        ]
+        for _ in range(2):
+            self.assertEqual(external_products(["3017620422003"]), {})
+        self.assertFalse(ExternalProductCache.objects.exists())
+        self.assertIn("3017620422003", external_products(["3017620422003"]))
+
+    def test_expired_product_is_fetched_again(self, session):
+        session.get.return_value = response(product=NUTELLA)
+        external_products(["3017620422003"])
+        ExternalProductCache.objects.update(
+            fetched_at=timezone.now() - timedelta(days=2)
+        )
+        external_products(["3017620422003"])
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(ExternalProductCache.objects.count(), 1)
+
+    @patch("apps.resources.external.EXTERNAL_DEADLINE", 0.2)
+    def test_late_products_are_left_out(self, session):
+        def get(url, timeout):
+            if "slow" in url:
+                time.sleep(1)
+            return response(product=NUTELLA)
+
+        session.get.side_effect = get
+        started = time.monotonic()
+        products = external_products(["slow", "fast"])
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(list(products), ["fast"])
+
+    def test_no_codes(self, session):
+        with self.assertNumQueries(0):
+            self.assertEqual(external_products([]), {})
+        session.get.assert_not_called()
@@ -0,0 +1,102 @@
+from io import StringIO
+from unittest.mock import patch
+
+import requests
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.resources.fakeoff import FakeCatalogue, FakeOpenFoodFacts
+from apps.resources.models import BackupProduct, Category, Product
+from .utils import credentials
+
+
+class FakeCatalogueTest(TestCase):
+    def setUp(self):
+        self.catalogue = FakeCatalogue(3, 45)
+
+    def test_code_gives_the_position_back(self):
+        code = self.catalogue.code(2, 44)
+        self.assertEqual(self.catalogue.position(code), (2, 44))
+        self.assertIsNone(self.catalogue.position(self.catalogue.code(3, 0)))
+        self.assertIsNone(self.catalogue.position("42"))
+
+    def test_category_pages(self):
+        pages = [
+            self.catalogue.category_page(0, page, "http://off.test")
+            for page in (1, 2, 3, 4)
+        ]
+        self.assertEqual(
+            [len(p["products"]) for p in pages], [20, 20, 5, 0]
+        )
+        self.assertIsNone(self.catalogue.category_page(3, 1, "http://off"))
+
+    def test_catalogue_is_reproducible(self):
+        self.assertEqual(
+            FakeCatalogue(3, 45, seed=1).product(1, 2, "http://off.test"),
+            FakeCatalogue(3, 45, seed=1).product(1, 2, "http://off.test")
+        )
+
+
+class FakeOpenFoodFactsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeOpenFoodFacts(FakeCatalogue(3, 45)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def test_categories(self):
+        response = requests.get(f"{self.server.url}/categories.json")
+        tags = response.json()["tags"]
+        self.assertEqual(len(tags), 3)
+        self.assertTrue(tags[0]["url"].startswith(self.server.url))
+
+    def test_product(self):
+        response = requests.get(
+            f"{self.server.url}/api/v0/product/0001000000003.json"
+        )
+        self.assertEqual(response.json()["product"]["code"], "0001000000003")
+        response = requests.get(
+            f"{self.server.url}/api/v0/product/0001000000045.json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_request(self):
+        url = f"{self.server.url}/categorie/category-1/2.json"
+        etag = requests.get(url).headers["ETag"]
+        response = requests.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_error_rate(self):
+        with FakeOpenFoodFacts(FakeCatalogue(1, 1), error_rate=1) as server:
+            response = requests.get(f"{server.url}/categories.json")
+        self.assertEqual(response.status_code, 503)
+
+    def test_sync_database(self):
+        with patch(
+            "apps.resources.management.commands.sync_database."
+            "CATEGORIES_URL",
+            f"{self.server.url}/categories.json"
+        ):
+            call_command("sync_database", stdout=StringIO())
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 3 * 45)
+
+    def test_saved_products_fallback(self):
+        user = User.objects.create_user(**credentials)
+        BackupProduct.objects.create(
+            product_code="0002000000010", user=user, category_name="none"
+        )
+        self.client.login(**credentials)
+        with patch(
+            "apps.resources.external.PRODUCTS_URL",
+            f"{self.server.url}/api/v0/product/"
+        ):
+            response = self.client.get(reverse("resources:products_saved"))
+        self.assertContains(response, "Produit 1-10")
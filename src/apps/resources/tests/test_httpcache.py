@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.resources.constants import CATEGORIES_URL
+from apps.resources.httpcache import ResponseCache
+from apps.resources.models import Product
+from .test_commands import fake_catalogue
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serve the pages of the stand-in server with an ETag.
+    """
+    def do_GET(self):
+        server = self.server
+        page = server.pages.get(f"{server.url}{self.path}")
+        if page is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(page).encode("utf-8")
+        etag = '"{}"'.format(hash(body))
+        server.requests.append(self.path)
+        if self.headers.get("If-None-Match") == etag:
+            server.not_modified.append(self.path)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_a_cached_response(self):
+        cache = ResponseCache(self.directory.name, 1024)
+        cache.set("http://off.test/1.json", "{}", etag='"a"')
+        entry = cache.get("http://off.test/1.json")
+        self.assertEqual(entry["body"], "{}")
+        self.assertEqual(cache.headers(entry), {"If-None-Match": '"a"'})
+
+    def test_get_an_unknown_url(self):
+        cache = ResponseCache(self.directory.name, 1024)
+        self.assertIsNone(cache.get("http://off.test/1.json"))
+
+    def test_least_recently_used_responses_are_evicted(self):
+        # Room for three responses of about 210 bytes.
+        cache = ResponseCache(self.directory.name, 700)
+        for page in range(3):
+            cache.set(f"http://off.test/{page}.json", "x" * 100, etag="a")
+            # Make sure the responses have different times of use.
+            path = cache.path(f"http://off.test/{page}.json")
+            os.utime(path, (page, page))
+        cache.get("http://off.test/0.json")
+        for page in range(3, 5):
+            cache.set(f"http://off.test/{page}.json", "x" * 100, etag="a")
+        self.assertLessEqual(cache.size, 700)
+        self.assertIsNotNone(cache.get("http://off.test/0.json"))
+        self.assertIsNone(cache.get("http://off.test/1.json"))
+        self.assertIsNotNone(cache.get("http://off.test/4.json"))
+
+
+class ConditionalSyncDatabaseCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(("127.0.0.1", 0), StandInHandler)
+        cls.server.url = "http://127.0.0.1:{}".format(cls.server.server_port)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.server.pages = {}
+        for url, page in fake_catalogue(3, 45).items():
+            if url == CATEGORIES_URL:
+                url = f"{self.server.url}/categories.json"
+            url = url.replace("https://off.test", self.server.url)
+            if "tags" in page:
+                for tag in page["tags"]:
+                    tag["url"] = tag["url"].replace(
+                        "https://off.test", self.server.url
+                    )
+            self.server.pages[url] = page
+        self.server.requests = []
+        self.server.not_modified = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sync(self, *args):
+        out = StringIO()
+        with patch(
+            "apps.resources.management.commands.sync_database."
+            "CATEGORIES_URL",
+            f"{self.server.url}/categories.json"
+        ):
+            call_command(
+                "sync_database", "--cache-dir", self.directory.name, *args,
+                stdout=out
+            )
+        return out.getvalue()
+
+    def test_unchanged_catalogue_is_skipped(self):
+        self.sync()
+        ids = dict(Product.objects.values_list("code", "id"))
+        self.server.requests = []
+        out = self.sync("--incremental")
+        self.assertEqual(len(self.server.requests), 1 + 3 * 3)
+        self.assertEqual(self.server.not_modified, self.server.requests)
+        self.assertEqual(out.count("inchangée"), 3)
+        self.assertEqual(dict(Product.objects.values_list("code", "id")), ids)
+
+    def test_modified_page_is_synchronised(self):
+        self.sync()
+        page = self.server.pages[
+            f"{self.server.url}/category/category-1/2.json"
+        ]
+        page["products"][0]["product_name"] = "updated"
+        out = self.sync("--incremental")
+        self.assertEqual(out.count("inchangée"), 2)
+        self.assertIn("0 produit(s) ajouté(s), 1 mis à jour", out)
+        self.assertTrue(
+            Product.objects.filter(product_name="updated").exists()
+        )
+
+    def test_reload_uses_cached_pages(self):
+        self.sync()
+        self.sync()
+        self.assertEqual(Product.objects.count(), 3 * 45)
+        self.assertEqual(len(self.server.not_modified), 1 + 3 * 3)
@@ -0,0 +1,92 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from apps.resources.loaders import load_products
+from apps.resources.models import BackupProduct, Category, Product
+from apps.resources.scoring import score_catalogue
+from apps.resources.substitutes import refresh_substitutes
+
+NB_CATEGORY = 500
+NB_PRODUCT = 40
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class IndexTest(TestCase):
+    """
+    Check that the hot queries of the site don't scan a whole table of
+    a large catalogue.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.bulk_create(
+            Category(name=f"category_{c}") for c in range(NB_CATEGORY)
+        )
+        load_products(
+            Product(
+                product_name=f"product {c:04} {index:04}",
+                code=f"{c:04}{index:08}",
+                nutrition_grades="abcde"[index % 5],
+                category=category
+            )
+            for c, category in enumerate(Category.objects.order_by("id"))
+            for index in range(NB_PRODUCT)
+        )
+        User.objects.bulk_create(
+            User(username=f"user_{u}") for u in range(100)
+        )
+        BackupProduct.objects.bulk_create(
+            BackupProduct(
+                product_code=f"{index:08}",
+                category_name="category",
+                user=user
+            )
+            for user in User.objects.all()
+            for index in range(100)
+        )
+        score_catalogue()
+        refresh_substitutes()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertNoSequentialScan(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan)
+        return plan
+
+    def test_substitutes_are_read_in_the_index_order(self):
+        product = Product.objects.get(code="001200000003")
+        plan = self.assertNoSequentialScan(
+            Product.get_substitutes(product.id)
+        )
+        self.assertIn("resources_substitute_rank_uniq", plan)
+        self.assertNotIn("Sort", plan)
+
+    def test_product_by_code(self):
+        self.assertNoSequentialScan(
+            Product.objects.filter(code="001200000003")
+        )
+
+    def test_category_by_name(self):
+        self.assertNoSequentialScan(
+            Category.objects.filter(name="category_12")
+        )
+
+    def test_product_name_prefix(self):
+        plan = self.assertNoSequentialScan(
+            Product.objects.filter(product_name__startswith="product 0012 ")
+        )
+        self.assertIn("resources_product_name_idx", plan)
+
+    def test_saved_products(self):
+        user = User.objects.get(username="user_12")
+        self.assertNoSequentialScan(
+            BackupProduct.objects.filter(user=user, product_code="00000012")
+        )
+        self.assertNoSequentialScan(
+            BackupProduct.objects
+            .filter(user=user)
+            .values_list("product_code", flat=True)
+        )
@@ -0,0 +1,68 @@
+from django.db import connection
+from django.test import TestCase
+
+from apps.resources.loaders import CopyStream, load_products
+from apps.resources.models import Category, Product
+
+
+class CopyStreamTest(TestCase):
+    def test_null_and_empty_string_are_different(self):
+        self.assertEqual(CopyStream.encode([None, "", 1]), ',"","1"\n')
+
+    def test_quotes_are_escaped(self):
+        self.assertEqual(
+            CopyStream.encode(['say "hi", bye']), '"say ""hi"", bye"\n'
+        )
+
+    def test_read_by_chunk(self):
+        rows = [[str(i), "x" * i] for i in range(50)]
+        stream = CopyStream(rows)
+        chunks = []
+        while True:
+            chunk = stream.read(16)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 16)
+            chunks.append(chunk)
+        self.assertEqual(
+            "".join(chunks), "".join(CopyStream.encode(r) for r in rows)
+        )
+
+
+class LoadProductsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="category_a")
+
+    def products(self, nb_product):
+        for index in range(nb_product):
+            yield Product(
+                product_name=f'product "{index}", with\nnew line',
+                code=f"{index:013}",
+                img_url=None,
+                url="",
+                allergens="en:milk,en:nuts",
+                nutrition_grades="abcde"[index % 5],
+                category=self.category
+            )
+
+    def test_load_products_from_a_generator(self):
+        total = load_products(self.products(25), batch_size=10)
+        self.assertEqual(total, 25)
+        self.assertEqual(Product.objects.count(), 25)
+
+    def test_load_products_keeps_values(self):
+        load_products(self.products(3))
+        product = Product.objects.get(code=f"{2:013}")
+        self.assertEqual(product.product_name, 'product "2", with\nnew line')
+        self.assertIsNone(product.img_url)
+        self.assertEqual(product.url, "")
+        self.assertEqual(product.allergens, "en:milk,en:nuts")
+        self.assertEqual(product.category, self.category)
+
+    def test_load_products_runs_one_query_per_batch(self):
+        # On PostgreSQL each batch is a single COPY inside a savepoint,
+        # other databases may split a batch in several INSERT.
+        if connection.vendor == "postgresql":
+            with self.assertNumQueries(3 * 3):
+                load_products(self.products(25), batch_size=10)
@@ -0,0 +1,153 @@
+import json
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+
+class MigrationTest(TransactionTestCase):
+    """
+    Apply a migration of the resources application to the data of the
+    migration before it.
+    """
+    migrate_from = None
+    migrate_to = None
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([("resources", target)])
+        return executor.loader.project_state(
+            [("resources", target)]
+        ).apps
+
+    def setUp(self):
+        self.apps = self.migrate(self.migrate_from)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+# The migrations can't be unapplied on SQLite, whose schema editor
+# doesn't skip the PostgreSQL extensions.
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class MergeCategoriesMigrationTest(MigrationTest):
+    migrate_from = "0003_syncrun"
+    migrate_to = "0004_indexes"
+
+    def test_duplicate_categories_are_merged(self):
+        Category = self.apps.get_model("resources", "Category")
+        Product = self.apps.get_model("resources", "Product")
+        categories = [Category.objects.create(name="snacks") for _ in "ab"]
+        Category.objects.create(name="spreads")
+        for category in categories:
+            Product.objects.create(
+                product_name="Kinder Bueno", code="8000500037560",
+                nutrition_grades="e", category=category
+            )
+        apps = self.migrate(self.migrate_to)
+        Category = apps.get_model("resources", "Category")
+        Product = apps.get_model("resources", "Product")
+        self.assertEqual(
+            sorted(Category.objects.values_list("name", flat=True)),
+            ["snacks", "spreads"]
+        )
+        self.assertEqual(
+            set(Product.objects.values_list("category_id", flat=True)),
+            {categories[0].pk}
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class ScoreMigrationTest(MigrationTest):
+    migrate_from = "0006_trigram"
+    migrate_to = "0007_score"
+
+    def test_products_are_scored(self):
+        Category = self.apps.get_model("resources", "Category")
+        Product = self.apps.get_model("resources", "Product")
+        category = Category.objects.create(name="spreads")
+        for grade, salt in (("a", "low"), ("e", "high"), ("x", None)):
+            Product.objects.create(
+                product_name="spread", code="1", nutrition_grades=grade,
+                salt=salt, fat="low", sugars="low", saturated_fat="low",
+                category=category
+            )
+        apps = self.migrate(self.migrate_to)
+        Product = apps.get_model("resources", "Product")
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list(
+                "score", flat=True
+            )),
+            [0, 42, 51]
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class SubstitutesMigrationTest(MigrationTest):
+    migrate_from = "0007_score"
+    migrate_to = "0008_productsubstitute"
+
+    def test_substitutes_are_stored(self):
+        Category = self.apps.get_model("resources", "Category")
+        Product = self.apps.get_model("resources", "Product")
+        category = Category.objects.create(name="spreads")
+        better, worse = (
+            Product.objects.create(
+                product_name="spread", code=str(score),
+                nutrition_grades="a", score=score, category=category
+            )
+            for score in (0, 40)
+        )
+        apps = self.migrate(self.migrate_to)
+        ProductSubstitute = apps.get_model("resources", "ProductSubstitute")
+        self.assertEqual(
+            list(ProductSubstitute.objects.values_list(
+                "product", "substitute", "rank"
+            )),
+            [(worse.pk, better.pk, 1)]
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class SnapshotMigrationTest(MigrationTest):
+    migrate_from = "0009_externalproductcache"
+    migrate_to = "0010_backupproduct_snapshot"
+
+    def test_saved_products_are_snapshot(self):
+        User = self.apps.get_model("auth", "User")
+        Category = self.apps.get_model("resources", "Category")
+        Product = self.apps.get_model("resources", "Product")
+        ExternalProductCache = self.apps.get_model(
+            "resources", "ExternalProductCache"
+        )
+        BackupProduct = self.apps.get_model("resources", "BackupProduct")
+        category = Category.objects.create(name="pâtes à tartiner")
+        product = Product.objects.create(
+            product_name="Nutella", code="3017620422003",
+            nutrition_grades="e", category=category
+        )
+        ExternalProductCache.objects.create(
+            code="8000500037560", fetched_at=timezone.now(),
+            data=json.dumps({"product_name": "Kinder Bueno"})
+        )
+        user = User.objects.create(username="user", email="user@test.fr")
+        for code in ("3017620422003", "8000500037560", "0000000000000"):
+            BackupProduct.objects.create(
+                product_code=code, category_name=category.name, user=user
+            )
+        apps = self.migrate(self.migrate_to)
+        BackupProduct = apps.get_model("resources", "BackupProduct")
+        saved = list(BackupProduct.objects.order_by("id"))
+        self.assertEqual(saved[0].product_id, product.pk)
+        self.assertEqual(
+            json.loads(saved[0].snapshot)["product_name"], "Nutella"
+        )
+        self.assertIsNone(saved[1].product_id)
+        snapshot = json.loads(saved[1].snapshot)
+        self.assertEqual(snapshot["product_name"], "Kinder Bueno")
+        self.assertIsNone(snapshot["nutrition_grades"])
+        self.assertIsNone(saved[2].snapshot)
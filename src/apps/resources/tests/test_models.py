@@ -5,6 +5,8 @@ from django.contrib.auth.models import User
 from django.test import TestCase
 
 from apps.resources.models import Category, BackupProduct, Product
+from apps.resources.scoring import score_catalogue
+from apps.resources.substitutes import refresh_substitutes
 from .utils import credentials
 
 
@@ -84,9 +86,18 @@ class ProductModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         """
-        Create X product to a category.
+        Create X product to a category, with their substitutes.
         """
         create_products(14)
+        # The catalogue has better and worse products.
+        Product.objects.filter(
+            pk=Product.objects.order_by("id").first().pk
+        ).update(nutrition_grades="a")
+        Product.objects.filter(
+            pk=Product.objects.order_by("id").last().pk
+        ).update(nutrition_grades="e")
+        score_catalogue()
+        refresh_substitutes()
 
     def test_product_name_label(self):
         product = Product.objects.order_by('?').first()
@@ -208,13 +219,28 @@ class ProductModelTest(TestCase):
         self.assertEqual(f"{product.product_name}", str(product))
 
     def test_substitute_list_length(self):
-        product = Product.objects.order_by('?').first()
+        product = Product.objects.order_by("-score", "id").first()
         substitutes = Product.get_substitutes(product.id)
-        self.assertTrue(substitutes.count() <= 12)
+        self.assertTrue(0 < substitutes.count() <= 12)
+
+    def test_product_with_its_substitutes(self):
+        product = Product.objects.order_by("-score", "id").first()
+        with self.assertNumQueries(1):
+            found, substitutes = Product.objects.with_substitutes(product.id)
+        self.assertEqual(found, product)
+        self.assertTrue(substitutes)
+        self.assertEqual(
+            substitutes, list(Product.get_substitutes(product.id))
+        )
+        self.assertNotIn(product, substitutes)
+
+    def test_unknown_product_with_its_substitutes(self):
+        with self.assertRaises(Product.DoesNotExist):
+            Product.objects.with_substitutes(0)
 
     def test_products_saved_not_in_substitutes(self):
         products = []
-        for p in ["ananas", "banane"]:
+        for p, grade in [("ananas", "a"), ("banane", "e")]:
             products.append(
                 Product(
                     product_name=p,
@@ -227,11 +253,13 @@ class ProductModelTest(TestCase):
                     saturated_fat=random_string(),
                     warehouse=random_string(100),
                     allergens=random_string(100),
-                    nutrition_grades='a',
+                    nutrition_grades=grade,
                     category=Category.objects.get(name="category_a")
                 )
             )
         Product.objects.bulk_create(products)
+        score_catalogue()
+        refresh_substitutes()
         # Create a user.
         test_user1 = User.objects.create_user(**credentials)
         test_user1.save()
@@ -240,7 +268,7 @@ class ProductModelTest(TestCase):
             email=credentials["email"], password=credentials["password"]
         )
         # Save a product.
-        product = Product.objects.get(product_name="ananas")
+        product = Product.objects.get(product_name="banane")
         backup_product = BackupProduct.objects.create(
             product_code=product.code,
             category_name=product.category.name,
@@ -250,6 +278,7 @@ class ProductModelTest(TestCase):
         substitutes = list(Product.get_substitutes(product.id))
         print(backup_product.product_code)
         print([s.code for s in substitutes])
+        self.assertIn(Product.objects.get(product_name="ananas"), substitutes)
         self.assertFalse(
             backup_product.product_code in [s.code for s in substitutes]
         )
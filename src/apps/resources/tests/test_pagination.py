@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from apps.resources.models import Category, Product
+from apps.resources.pagination import decode_cursor, encode_cursor, paginate
+
+
+class CursorTest(TestCase):
+    def test_cursor_gives_the_position_back(self):
+        product = Product(pk=42)
+        product.cursor_rank = 0.06079271063208580
+        self.assertEqual(
+            decode_cursor(encode_cursor(product)), (0.0607927106320858, 42)
+        )
+
+    def test_invalid_cursor(self):
+        for cursor in ("x", "WzEsICJhIl0", "bnVsbA"):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class PaginateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="category_a")
+        Product.objects.bulk_create(
+            Product(
+                product_name=name,
+                code=str(index),
+                nutrition_grades="a",
+                category=category
+            )
+            for index, name in enumerate(
+                ["pâte à tartiner"] * 5 + ["biscuit et pâte à tartiner"] * 5
+            )
+        )
+
+    def test_pages_keep_the_order_of_the_results(self):
+        results = Product.objects.search("pâte à tartiner")
+        products, cursor = paginate(results, size=4)
+        while cursor:
+            page, cursor = paginate(results, cursor, size=4)
+            products.extend(page)
+        self.assertEqual(products, list(results))
+
+    def test_last_page(self):
+        products, cursor = paginate(
+            Product.objects.search("pâte à tartiner"), size=10
+        )
+        self.assertEqual(len(products), 10)
+        self.assertIsNone(cursor)
@@ -0,0 +1,111 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.resources.generation import expire_generation, publish_generation
+from apps.resources.models import Category, Product, SyncRun
+from apps.resources.productcache import (
+    LRUCache, ProductPageCache, product_pages
+)
+from .utils import credentials
+
+
+class LRUCacheTest(TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = LRUCache(max_size=2, ttl=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+        self.assertEqual(len(lru), 2)
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIsNone(lru.get("b"))
+
+    def test_entry_expires(self):
+        lru = LRUCache(max_size=2, ttl=60)
+        with patch("time.monotonic", return_value=1000):
+            lru.set("a", 1)
+        with patch("time.monotonic", return_value=1059):
+            self.assertEqual(lru.get("a"), 1)
+        with patch("time.monotonic", return_value=1061):
+            self.assertIsNone(lru.get("a"))
+        self.assertEqual(len(lru), 0)
+
+    def test_stats(self):
+        lru = LRUCache(max_size=10, ttl=60)
+        lru.set("a", 1)
+        for key in ("a", "a", "a", "b"):
+            lru.get(key)
+        self.assertEqual(lru.stats(), {
+            "size": 1, "max_size": 10, "hits": 3, "misses": 1,
+            "hit_rate": 0.75
+        })
+
+
+class ProductPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="category_a")
+        cls.product = Product.objects.create(
+            product_name="Nutella",
+            code="3017620422003",
+            nutrition_grades="e",
+            category=category
+        )
+
+    def setUp(self):
+        cache.clear()
+        expire_generation()
+
+    def test_page_is_read_once(self):
+        pages = ProductPageCache()
+        page = pages.get(self.product.pk)
+        self.assertEqual(page.product.product_name, "Nutella")
+        with self.assertNumQueries(0):
+            self.assertEqual(pages.get(str(self.product.pk)), page)
+        self.assertEqual(pages.stats()["hits"], 1)
+
+    def test_page_is_immutable(self):
+        page = ProductPageCache().get(self.product.pk)
+        with self.assertRaises(AttributeError):
+            page.product.product_name = "Pâte à tartiner"
+
+    def test_new_generation_empties_the_cache(self):
+        pages = ProductPageCache()
+        pages.get(self.product.pk)
+        Product.objects.filter(pk=self.product.pk).update(
+            product_name="Nutella B-ready"
+        )
+        self.assertEqual(
+            pages.get(self.product.pk).product.product_name, "Nutella"
+        )
+        run = SyncRun.objects.create(
+            status=SyncRun.DONE, finished_at=timezone.now()
+        )
+        publish_generation(run.pk)
+        self.assertEqual(
+            pages.get(self.product.pk).product.product_name, "Nutella B-ready"
+        )
+
+    def test_unknown_product(self):
+        with self.assertRaises(Product.DoesNotExist):
+            ProductPageCache().get(0)
+
+    def test_stats_view_is_reserved_to_the_staff(self):
+        url = reverse("resources:products_cache_stats")
+        user = User.objects.create_user(**credentials)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        user.is_staff = True
+        user.save()
+        product_pages.clear()
+        self.client.get(
+            reverse("resources:products_list", args=[self.product.pk])
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.json()["size"], 1)
+        product_pages.clear()
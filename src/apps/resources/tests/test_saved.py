@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from apps.resources.models import BackupProduct, Category, Product
+from apps.resources.saved import link_saved_products
+from .utils import credentials
+
+
+class LinkSavedProductsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(**credentials)
+        cls.spreads = Category.objects.create(name="pâtes à tartiner")
+        cls.snacks = Category.objects.create(name="snacks")
+        cls.nutella = Product.objects.create(
+            product_name="Nutella", code="3017620422003",
+            nutrition_grades="e", category=cls.spreads
+        )
+        cls.bueno = Product.objects.create(
+            product_name="Kinder Bueno", code="8000500037560",
+            nutrition_grades="e", category=cls.snacks
+        )
+
+    def save(self, code, category_name="pâtes à tartiner", **fields):
+        return BackupProduct.objects.create(
+            product_code=code, category_name=category_name, user=self.user,
+            **fields
+        )
+
+    def test_saved_products_are_linked(self):
+        saved = self.save("3017620422003")
+        # The code is looked up in the category of the saved product.
+        elsewhere = self.save("8000500037560")
+        self.assertEqual(link_saved_products(), 1)
+        saved.refresh_from_db()
+        elsewhere.refresh_from_db()
+        self.assertEqual(saved.product, self.nutella)
+        self.assertEqual(saved.data["product_name"], "Nutella")
+        self.assertIsNone(elsewhere.product)
+        self.assertIsNone(elsewhere.snapshot)
+
+    def test_snapshot_is_kept(self):
+        snapshot = BackupProduct.snapshot_of({"product_name": "Nutella 1kg"})
+        saved = self.save("3017620422003", snapshot=snapshot)
+        self.assertEqual(link_saved_products(), 1)
+        saved.refresh_from_db()
+        self.assertEqual(saved.product, self.nutella)
+        self.assertEqual(saved.snapshot, snapshot)
+
+    def test_snapshot_is_compact(self):
+        snapshot = BackupProduct.snapshot_of(self.nutella)
+        self.assertIn('{"product_name":"Nutella","img_url":null,', snapshot)
+
+    def test_batches(self):
+        for _ in range(5):
+            self.save("3017620422003")
+        with self.assertNumQueries(3 * 3 + 1):
+            self.assertEqual(link_saved_products(batch_size=2), 5)
+        self.assertFalse(
+            BackupProduct.objects.filter(product=None).exists()
+        )
+
+    def test_only_the_unlinked_products_are_read(self):
+        self.save(
+            "3017620422003", product=self.nutella,
+            snapshot=BackupProduct.snapshot_of(self.nutella)
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(link_saved_products(), 0)
+
+    @patch(
+        "apps.resources.saved.external_products",
+        return_value={"0000000000000": {"product_name": "Pâte maison"}}
+    )
+    def test_missing_products_are_fetched(self, external_products):
+        saved = self.save("0000000000000")
+        self.assertEqual(link_saved_products(), 0)
+        external_products.assert_not_called()
+        self.assertEqual(link_saved_products(fetch=True), 1)
+        saved.refresh_from_db()
+        self.assertIsNone(saved.product)
+        self.assertEqual(saved.data["product_name"], "Pâte maison")
+        self.assertIsNone(saved.data["nutrition_grades"])
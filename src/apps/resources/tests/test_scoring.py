@@ -0,0 +1,74 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.resources.models import Category, Product
+from apps.resources.scoring import compute_scores, score_catalogue
+from apps.resources.substitutes import refresh_substitutes
+from .test_commands import fake_catalogue, fake_session
+
+
+def create_product(name, grade, levels, category):
+    salt, fat, sugars, saturated_fat = levels
+    return Product.objects.create(
+        product_name=name,
+        code=name,
+        nutrition_grades=grade,
+        salt=salt,
+        fat=fat,
+        sugars=sugars,
+        saturated_fat=saturated_fat,
+        category=category
+    )
+
+
+class ComputeScoresTest(TestCase):
+    def test_grade_outweighs_the_levels(self):
+        scores = compute_scores([
+            ("a", "high", "high", "high", "high"),
+            ("b", "low", "low", "low", "low"),
+            ("b", "low", "moderate", None, "high"),
+            ("z", None, None, None, None),
+        ])
+        self.assertEqual(scores.tolist(), [8, 10, 14, 54])
+
+    def test_no_product(self):
+        self.assertEqual(len(compute_scores([])), 0)
+
+
+class SubstitutesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="pâtes à tartiner")
+        other = Category.objects.create(name="biscuits")
+        create_product("light", "b", ("low", "low", "low", "low"), category)
+        create_product("sweet", "b", ("low", "low", "high", "low"), category)
+        create_product("source", "c", ("low", "low", "high", "high"), category)
+        create_product("same", "c", ("low", "low", "high", "high"), category)
+        create_product("worse", "d", ("low", "low", "low", "low"), category)
+        create_product("other", "a", ("low", "low", "low", "low"), other)
+        score_catalogue()
+        refresh_substitutes()
+
+    def names(self, name):
+        product = Product.objects.get(product_name=name)
+        return [p.product_name for p in Product.get_substitutes(product.id)]
+
+    def test_levels_order_the_products_of_a_grade(self):
+        self.assertEqual(self.names("source"), ["light", "sweet"])
+
+    def test_only_strictly_better_products(self):
+        self.assertEqual(self.names("light"), [])
+        self.assertNotIn("same", self.names("source"))
+
+    def test_synchronisation_scores_the_products(self):
+        for options in ([], ["--swap"]):
+            with patch(
+                "requests.Session",
+                return_value=fake_session(fake_catalogue(2, 5))
+            ):
+                call_command("sync_database", *options, stdout=StringIO())
+            self.assertEqual(Product.objects.count(), 10)
+            self.assertFalse(Product.objects.filter(score=None).exists())
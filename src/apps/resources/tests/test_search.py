@@ -0,0 +1,186 @@
+from io import StringIO
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.resources.loaders import load_products
+from apps.resources.models import Category, Product
+from .test_commands import fake_catalogue, fake_session
+
+
+def create_product(name, brand="", category=None):
+    return Product.objects.create(
+        product_name=name,
+        warehouse=brand,
+        code=name[:30],
+        nutrition_grades="a",
+        category=category or Category.objects.get_or_create(name="c")[0]
+    )
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class FullTextSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_product("Pâte à tartiner aux noisettes", "Nutella")
+        create_product("Chocolats noirs pâtissiers", "Nestlé")
+        create_product("Biscuits fourrés", "Pâtes Lustucru")
+
+    def names(self, words):
+        return list(
+            Product.objects.search(words).values_list(
+                "product_name", flat=True
+            )
+        )
+
+    def test_search_ignores_accents_and_case(self):
+        self.assertEqual(
+            self.names("PATE A TARTINER"), ["Pâte à tartiner aux noisettes"]
+        )
+
+    def test_search_stems_the_words(self):
+        self.assertEqual(
+            self.names("chocolat noir"), ["Chocolats noirs pâtissiers"]
+        )
+
+    def test_search_the_brand(self):
+        self.assertEqual(
+            self.names("nutella"), ["Pâte à tartiner aux noisettes"]
+        )
+
+    def test_name_ranks_before_brand(self):
+        self.assertEqual(self.names("pâtes"), [
+            "Pâte à tartiner aux noisettes", "Biscuits fourrés"
+        ])
+
+    def test_vector_follows_the_product(self):
+        product = Product.objects.get(product_name="Biscuits fourrés")
+        Product.objects.filter(pk=product.pk).update(
+            product_name="Gaufres fourrées"
+        )
+        self.assertEqual(self.names("gaufre"), ["Gaufres fourrées"])
+        self.assertEqual(self.names("biscuit"), [])
+
+    def test_synchronised_products_are_searchable(self):
+        with patch(
+            "requests.Session", return_value=fake_session(fake_catalogue(1, 5))
+        ):
+            call_command("sync_database", "--swap", stdout=StringIO())
+        self.assertEqual(len(self.names("product_0_3")), 1)
+
+    def test_search_uses_the_index(self):
+        category = Category.objects.create(name="large")
+        load_products(
+            Product(
+                product_name=f"produit {index}",
+                code=str(index),
+                nutrition_grades="a",
+                category=category
+            )
+            for index in range(20000)
+        )
+        with connection.cursor() as cursor:
+            # Do the work of the autovacuum, which can't run in the
+            # transaction of the test.
+            cursor.execute(
+                "SELECT gin_clean_pending_list("
+                "'resources_product_search_idx'::regclass)"
+            )
+            cursor.execute("ANALYZE resources_product")
+        plan = Product.objects.search("noisette").explain()
+        self.assertIn("resources_product_search_idx", plan)
+        self.assertNotIn("Seq Scan", plan)
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class FuzzySearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_product("Pâte à tartiner aux noisettes", "Nutella")
+        create_product("Chocolat noir", "Nestlé")
+        create_product("Chocolat au lait", "Milka")
+
+    def names(self, words):
+        return list(
+            Product.objects.search(words).values_list(
+                "product_name", flat=True
+            )
+        )
+
+    def test_misspelt_brand(self):
+        self.assertEqual(
+            self.names("nuttella"), ["Pâte à tartiner aux noisettes"]
+        )
+
+    def test_misspelt_name(self):
+        self.assertEqual(
+            self.names("chocolta noir")[0], "Chocolat noir"
+        )
+
+    def test_exact_match_skips_the_fuzzy_search(self):
+        self.assertEqual(self.names("milka"), ["Chocolat au lait"])
+
+    @override_settings(SEARCH_FUZZY="off")
+    def test_fuzzy_search_disabled(self):
+        self.assertEqual(self.names("nuttella"), [])
+
+    @override_settings(SEARCH_FUZZY="always")
+    def test_fuzzy_search_always(self):
+        names = self.names("chocolat noir")
+        self.assertEqual(names[0], "Chocolat noir")
+        self.assertIn("Chocolat au lait", names)
+
+    def test_fuzzy_search_uses_the_indexes(self):
+        category = Category.objects.create(name="large")
+        load_products(
+            Product(
+                product_name=f"produit {index}",
+                warehouse=f"marque {index}",
+                code=str(index),
+                nutrition_grades="a",
+                category=category
+            )
+            for index in range(20000)
+        )
+        with connection.cursor() as cursor:
+            for index in ("name", "brand"):
+                cursor.execute(
+                    "SELECT gin_clean_pending_list("
+                    f"'resources_product_{index}_trgm_idx'::regclass)"
+                )
+            cursor.execute("ANALYZE resources_product")
+        plan = Product.objects.fuzzy_search("nuttella").explain()
+        self.assertIn("resources_product_name_trgm_idx", plan)
+        self.assertIn("resources_product_brand_trgm_idx", plan)
+        self.assertNotIn("Seq Scan", plan)
+
+
+@skipIf(connection.vendor == "postgresql", "Without PostgreSQL.")
+class SearchFallbackTest(TestCase):
+    def test_name_starting_with_the_words_first(self):
+        create_product("Biscuit au chocolat")
+        create_product("Chocolat noir")
+        self.assertEqual(
+            list(Product.objects.search("chocolat").values_list(
+                "product_name", flat=True
+            )),
+            ["Chocolat noir", "Biscuit au chocolat"]
+        )
+
+
+class SearchProductViewRankTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_most_relevant_product_first(self):
+        create_product("Biscuit au chocolat")
+        product = create_product("Chocolat noir")
+        response = self.client.get(
+            reverse("resources:products_search") + "?word=chocolat noir"
+        )
+        self.assertEqual(response.context["products"][0], product)
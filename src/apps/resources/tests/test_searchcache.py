@@ -0,0 +1,91 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.resources.generation import (
+    catalogue_generation, expire_generation, publish_generation
+)
+from apps.resources.models import Category, Product, SyncRun
+from apps.resources.searchcache import search, search_key
+from .test_commands import fake_catalogue, fake_session
+
+
+class SearchCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="category_a")
+        Product.objects.bulk_create(
+            Product(
+                product_name=f"chocolat {index}",
+                code=str(index),
+                nutrition_grades="a",
+                category=category
+            )
+            for index in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+        expire_generation()
+        catalogue_generation()
+
+    def test_key_ignores_the_case_and_the_spaces(self):
+        self.assertEqual(
+            search_key(" Chocolat   NOIR", 1), search_key("chocolat noir", 1)
+        )
+        self.assertNotEqual(
+            search_key("chocolat noir", 1), search_key("chocolat noir", 2)
+        )
+
+    def test_cached_search_only_reads_the_page(self):
+        products, _ = search("chocolat", size=5)
+        with self.assertNumQueries(1):
+            cached, _ = search("CHOCOLAT ", size=5)
+        self.assertEqual(cached, products)
+
+    def test_search_without_results_is_cached(self):
+        self.assertEqual(search("xylophone"), ([], None))
+        with self.assertNumQueries(0):
+            self.assertEqual(search("xylophone"), ([], None))
+
+    def test_new_generation_invalidates_the_results(self):
+        search("xylophone")
+        Product.objects.filter(code="0").update(product_name="xylophone")
+        self.assertEqual(search("xylophone"), ([], None))
+        publish_generation(catalogue_generation() + 1)
+        self.assertEqual(len(search("xylophone")[0]), 1)
+
+    def test_pages_beyond_the_cached_results(self):
+        with patch("apps.resources.searchcache.SEARCH_CACHE_RESULTS", 8):
+            ids, cursor = [], None
+            while True:
+                products, cursor = search("chocolat", cursor, size=5)
+                ids.extend(p.pk for p in products)
+                if cursor is None:
+                    break
+        self.assertEqual(
+            ids,
+            list(Product.objects.search("chocolat").values_list(
+                "id", flat=True
+            ))
+        )
+
+    def test_view_uses_the_cache(self):
+        url = reverse("resources:products_search")
+        self.client.get(url, {"word": "chocolat"})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"word": "chocolat"})
+        self.assertEqual(len(response.context["products"]), 12)
+
+    def test_synchronisation_publishes_a_generation(self):
+        with patch(
+            "requests.Session", return_value=fake_session(fake_catalogue(1, 5))
+        ):
+            call_command("sync_database", stdout=StringIO())
+        run = SyncRun.objects.latest("id")
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogue_generation(), run.pk)
@@ -0,0 +1,97 @@
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.resources.generation import expire_generation
+from apps.resources.models import Product
+from apps.resources.productcache import product_pages
+from apps.resources.substituteindex import SubstituteEngine, SubstituteIndex
+from apps.resources.substitutes import refresh_substitutes
+from .test_autocomplete import publish_catalogue
+from .test_substitutes import create_catalogue
+
+
+class SubstituteIndexTest(TestCase):
+    def test_substitutes(self):
+        index = SubstituteIndex([
+            (4, 1, 3), (2, 1, 12), (3, 1, 12), (1, 1, 20), (5, 2, 0),
+        ])
+        self.assertEqual(index.substitutes(1), [4, 2, 3])
+        self.assertEqual(index.substitutes(1, limit=2), [4, 2])
+        self.assertEqual(index.substitutes(3), [4])
+        self.assertEqual(index.substitutes(5), [])
+        self.assertEqual(index.substitutes(6), [])
+
+    def test_large_catalogue(self):
+        size = 500000
+        index = SubstituteIndex(
+            (pk, pk // 1000, pk % 1000) for pk in range(size)
+        )
+        nbytes = sum(
+            column.nbytes for column in (
+                index.ids, index.categories, index.scores,
+                index.by_id, index.sorted_ids
+            )
+        )
+        self.assertLess(nbytes / size, 24)
+        durations = []
+        for pk in range(0, size, size // 1000):
+            start = time.perf_counter()
+            index.substitutes(pk)
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        # The median is compared, a few searches being slowed down by
+        # the other processes of a busy machine.
+        self.assertLess(durations[len(durations) // 2], 0.001)
+
+
+class SubstituteEngineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue()
+        refresh_substitutes()
+
+    def setUp(self):
+        cache.clear()
+        expire_generation()
+        product_pages.clear()
+
+    def test_same_substitutes_as_the_database(self):
+        engine = SubstituteEngine(background=False)
+        for product in Product.objects.all():
+            self.assertEqual(
+                engine.substitutes(product.pk),
+                list(Product.get_substitutes(product.pk).values_list(
+                    "id", flat=True
+                ))
+            )
+
+    def test_index_is_reloaded_for_a_new_generation(self):
+        engine = SubstituteEngine(background=False)
+        product = Product.objects.order_by("-score", "id").first()
+        best = engine.substitutes(product.pk)[0]
+        Product.objects.filter(pk=best).update(score=None)
+        # Same generation: the index is kept.
+        self.assertEqual(engine.substitutes(product.pk)[0], best)
+        publish_catalogue()
+        self.assertNotIn(best, engine.substitutes(product.pk))
+
+    @override_settings(SUBSTITUTES_ENGINE="memory")
+    def test_view(self):
+        product = Product.objects.order_by("-score", "id").first()
+        with patch(
+            "apps.resources.productcache.substitute_engine",
+            SubstituteEngine(background=False)
+        ):
+            response = self.client.get(
+                reverse("resources:products_list", args=[product.pk])
+            )
+        self.assertEqual(
+            [s.pk for s in response.context["substitutes"]],
+            list(Product.get_substitutes(product.pk).values_list(
+                "id", flat=True
+            ))
+        )
@@ -0,0 +1,135 @@
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from apps.resources.models import Category, Product, ProductSubstitute
+from apps.resources.scoring import score_catalogue
+from apps.resources.substitutes import (
+    refresh_all_substitutes, refresh_substitutes
+)
+from .test_commands import fake_catalogue, fake_session
+
+
+def create_catalogue(categories=3, products=20):
+    for c in range(categories):
+        category = Category.objects.create(name=f"category_{c}")
+        Product.objects.bulk_create(
+            Product(
+                product_name=f"product {c} {index}",
+                code=f"{c:04}{index:08}",
+                nutrition_grades="abcde"[index % 5],
+                salt=("low", "high")[index % 2],
+                category=category
+            )
+            for index in range(products)
+        )
+    score_catalogue()
+
+
+def stored_substitutes():
+    return list(
+        ProductSubstitute.objects
+        .order_by("product", "rank")
+        .values_list("product", "substitute", "rank")
+    )
+
+
+class RefreshSubstitutesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue()
+
+    def test_substitutes_are_the_best_strictly_better_products(self):
+        refresh_substitutes()
+        for product in Product.objects.all():
+            better = list(
+                Product.objects
+                .filter(category=product.category, score__lt=product.score)
+                .order_by("score", "id")[:12]
+            )
+            self.assertEqual(list(Product.get_substitutes(product.id)), better)
+
+    def test_refresh_some_categories(self):
+        refresh_substitutes()
+        expected = stored_substitutes()
+        category = Category.objects.get(name="category_1")
+        ProductSubstitute.objects.filter(product__category=category).delete()
+        missing = len(expected) - ProductSubstitute.objects.count()
+        self.assertEqual(
+            refresh_substitutes(categories=[category.id]), missing
+        )
+        self.assertEqual(stored_substitutes(), expected)
+
+    def test_synchronisation_reports_the_refresh(self):
+        for options in ([], ["--swap"]):
+            out = StringIO()
+            with patch(
+                "requests.Session",
+                return_value=fake_session(fake_catalogue(2, 5))
+            ):
+                call_command("sync_database", *options, stdout=out)
+            self.assertIn("substituts calculés en", out.getvalue())
+            self.assertFalse(
+                ProductSubstitute.objects
+                .exclude(product__in=Product.objects.all())
+                .exists()
+            )
+            self.assertTrue(ProductSubstitute.objects.exists())
+
+
+class SubstitutesBulkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue()
+        refresh_substitutes()
+
+    def test_same_substitutes_as_one_product_at_a_time(self):
+        ids = list(Product.objects.values_list("id", flat=True)) + [0]
+        with self.assertNumQueries(1):
+            substitutes = Product.get_substitutes_bulk(ids)
+        for pk in ids:
+            self.assertEqual(
+                substitutes[pk], list(Product.get_substitutes(pk))
+            )
+
+    def test_view(self):
+        products = list(Product.objects.order_by("-score", "id")[:3])
+        ids = [p.id for p in products]
+        url = reverse("resources:products_substitutes_api")
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, {"ids": ",".join(map(str, ids + ids[:1]))}
+            )
+        results = response.json()["results"]
+        self.assertEqual([r["id"] for r in results], ids)
+        self.assertEqual(
+            [s["id"] for s in results[0]["substitutes"]],
+            list(Product.get_substitutes(ids[0]).values_list(
+                "id", flat=True
+            ))
+        )
+
+    def test_invalid_ids(self):
+        url = reverse("resources:products_substitutes_api")
+        for ids in ("", "1,a", ",".join(map(str, range(101)))):
+            response = self.client.get(url, {"ids": ids})
+            self.assertEqual(response.status_code, 400)
+        # The repeated identifiers count once.
+        response = self.client.get(url, {"ids": ",".join(["1"] * 101)})
+        self.assertEqual(response.status_code, 200)
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL.")
+class ParallelRefreshSubstitutesTest(TransactionTestCase):
+    def test_workers_store_the_same_substitutes(self):
+        create_catalogue()
+        refresh_all_substitutes()
+        expected = stored_substitutes()
+        ProductSubstitute.objects.all().delete()
+        self.assertEqual(refresh_all_substitutes(workers=3), len(expected))
+        self.assertEqual(stored_substitutes(), expected)
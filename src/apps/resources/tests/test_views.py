@@ -1,11 +1,19 @@
 import random
 import string
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from apps.resources.generation import catalogue_generation
 from apps.resources.models import Category, BackupProduct, Product
+from apps.resources.productcache import product_pages
+from apps.resources.scoring import score_catalogue
+from apps.resources.substitutes import refresh_substitutes
 from .utils import credentials
 
 
@@ -69,6 +77,9 @@ class ShowProductViewTest(TestCase):
         """
         create_products(5)
 
+    def setUp(self):
+        product_pages.clear()
+
     def test_view_url_exists_and_can_watch_a_product(self):
         product_id = Product.objects.order_by('?').first().id
         response = self.client.get(f"/products/{product_id}/")
@@ -104,6 +115,9 @@ class SearchProductViewTest(TestCase):
         """
         create_products(10)
 
+    def setUp(self):
+        cache.clear()
+
     def test_view_url_exists(self):
         response = self.client.get("/products/search/")
         self.assertNotEqual(response.status_code, 404)
@@ -112,30 +126,125 @@ class SearchProductViewTest(TestCase):
         response = self.client.get(reverse("resources:products_search"))
         self.assertNotEqual(response.status_code, 404)
 
-    def test_redirect_home_if_no_product_found(self):
+    def test_no_product_found(self):
         response = self.client.get(
-            reverse("resources:products_search") + "?word=no_product"
+            reverse("resources:products_search") + "?word=xylophone"
         )
-        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "resources/search_results.html")
+        self.assertContains(response, "Aucun produit trouvé")
 
-    def test_redirect_product_list_if_product_found(self):
+    def test_products_found(self):
+        product = Product.objects.order_by('?').first()
         response = self.client.get(
             "{}?word={}".format(
-                reverse('resources:products_search'),
-                Product.objects.order_by('?').first().product_name
+                reverse('resources:products_search'), product.product_name
             )
         )
-        self.assertEqual(response.status_code, 302)
-        self.assertTrue(response.url.startswith("/products"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(product, response.context["products"])
+        self.assertContains(
+            response, reverse("resources:products_list", args=[product.pk])
+        )
+
+
+class SearchPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="category_a")
+        Product.objects.bulk_create(
+            Product(
+                product_name=f"chocolat {index}",
+                code=str(index),
+                nutrition_grades="a",
+                category=category
+            )
+            for index in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        return self.client.get(
+            reverse("resources:products_search_api"),
+            dict({"word": "chocolat"}, **params)
+        )
+
+    def test_pages_cover_the_results_once(self):
+        ids, cursor, pages = [], None, 0
+        while True:
+            params = {"page_size": 7}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.search(**params).json()
+            ids.extend(p["id"] for p in data["results"])
+            pages += 1
+            cursor = data["next"]
+            if cursor is None:
+                break
+        self.assertEqual(pages, 5)
+        self.assertEqual(
+            sorted(ids),
+            sorted(Product.objects.values_list("id", flat=True))
+        )
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_deep_page_costs_the_same_as_the_second_one(self):
+        with CaptureQueriesContext(connection) as first:
+            cursor = self.search(page_size=5).json()["next"]
+        with CaptureQueriesContext(connection) as second:
+            cursor = self.search(page_size=5, cursor=cursor).json()["next"]
+        for _ in range(3):
+            with self.assertNumQueries(len(second)):
+                cursor = self.search(page_size=5, cursor=cursor).json()["next"]
+        # No page skips the previous results with an offset.
+        for query in first.captured_queries + second.captured_queries:
+            self.assertNotIn("OFFSET", query["sql"])
+
+    def test_page_size_is_bounded(self):
+        self.assertEqual(len(self.search(page_size=0).json()["results"]), 1)
+        self.assertEqual(
+            len(self.search(page_size=1000).json()["results"]), 30
+        )
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.search(cursor="x").status_code, 400)
+        response = self.client.get(
+            reverse("resources:products_search"),
+            {"word": "chocolat", "cursor": "x"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_results_page_links_the_next_page(self):
+        response = self.client.get(
+            reverse("resources:products_search"), {"word": "chocolat"}
+        )
+        self.assertEqual(len(response.context["products"]), 12)
+        self.assertContains(
+            response, f"cursor={response.context['next_cursor']}"
+        )
 
 
 class ShowProductViewViewTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         """
-        Create X product to a category.
+        Create X product to a category, with their substitutes.
         """
         create_products(10)
+        # The catalogue has better and worse products.
+        Product.objects.filter(
+            pk=Product.objects.order_by("id").first().pk
+        ).update(nutrition_grades="a")
+        Product.objects.filter(
+            pk=Product.objects.order_by("id").last().pk
+        ).update(nutrition_grades="e")
+        score_catalogue()
+        refresh_substitutes()
+
+    def setUp(self):
+        product_pages.clear()
 
     def test_view_url_exists(self):
         product_id = Product.objects.order_by('?').first().id
@@ -157,6 +266,24 @@ class ShowProductViewViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "resources/product_details.html")
 
+    def test_catalogue_is_read_in_a_single_query(self):
+        product = Product.objects.order_by("-score", "id").first()
+        catalogue_generation()
+        url = reverse("resources:products_list", args=[product.id])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.context["product"].pk, product.pk)
+        self.assertTrue(response.context["substitutes"])
+        self.assertEqual(
+            [s.pk for s in response.context["substitutes"]],
+            list(Product.get_substitutes(product.id).values_list(
+                "id", flat=True
+            ))
+        )
+        # The page is then kept in memory.
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
 
 class SavedProductsListViewTest(TestCase):
     @classmethod
@@ -174,7 +301,9 @@ class SavedProductsListViewTest(TestCase):
             BackupProduct.objects.create(
                 product_code=product.code,
                 category_name=product.category.name,
-                user=test_user1
+                user=test_user1,
+                product=product,
+                snapshot=BackupProduct.snapshot_of(product)
             )
 
     def test_view_url_exists(self):
@@ -207,6 +336,72 @@ class SavedProductsListViewTest(TestCase):
             len(BackupProduct.objects.filter(user=user))
         )
 
+    def test_queries_dont_grow_with_the_saved_products(self):
+        self.client.login(**credentials)
+        url = reverse("resources:products_saved")
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        user = User.objects.get(email=credentials["email"])
+        for product in Product.objects.all()[5:]:
+            BackupProduct.objects.create(
+                product_code=product.code,
+                category_name=product.category.name,
+                user=user,
+                product=product,
+                snapshot=BackupProduct.snapshot_of(product)
+            )
+        with self.assertNumQueries(len(few)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["object_list"]), 10)
+        self.assertContains(
+            response,
+            reverse("resources:products_list", args=[product.id])
+        )
+
+    def test_list_is_read_without_the_catalogue(self):
+        self.client.login(**credentials)
+        url = reverse("resources:products_saved")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        tables = " ".join(query["sql"] for query in queries)
+        self.assertNotIn('"resources_product"', tables)
+        self.assertNotIn('"resources_category"', tables)
+
+    def test_product_missing_from_the_catalogue(self):
+        self.client.login(**credentials)
+        user = User.objects.get(email=credentials["email"])
+        saved = BackupProduct.objects.filter(user=user).first()
+        product_name = saved.product.product_name
+        saved.product.delete()
+        for code in ("3017620422003", "0000000000000"):
+            BackupProduct.objects.create(
+                product_code=code, category_name="pâtes à tartiner", user=user
+            )
+        with patch(
+            "apps.resources.views.external_products",
+            return_value={"3017620422003": {"product_name": "Nutella"}}
+        ) as external_products:
+            response = self.client.get(reverse("resources:products_saved"))
+        self.assertEqual(
+            list(external_products.call_args[0][0]),
+            ["3017620422003", "0000000000000"]
+        )
+        object_list = response.context["object_list"]
+        self.assertEqual(len(object_list), 6)
+        self.assertEqual(object_list[0].data["product_name"], product_name)
+        self.assertIsNone(object_list[0].product_id)
+        self.assertEqual(object_list[-1].data["product_name"], "Nutella")
+        self.assertContains(response, "Aucune fiche produit disponible")
+        # The snapshot of the fetched product is kept.
+        self.assertEqual(
+            BackupProduct.objects.get(product_code="3017620422003")
+            .data["product_name"],
+            "Nutella"
+        )
+        self.assertIsNone(
+            BackupProduct.objects.get(product_code="0000000000000").snapshot
+        )
+
 
 class SaveProductViewTest(TestCase):
     @classmethod
@@ -248,6 +443,19 @@ class SaveProductViewTest(TestCase):
             1
         )
 
+    def test_save_product_snapshot(self):
+        product = Product.objects.first()
+        self.client.login(**credentials)
+        self.client.post(
+            reverse("resources:products_save"), {"product_id": product.id}
+        )
+        saved = BackupProduct.objects.get()
+        self.assertEqual(saved.product, product)
+        self.assertEqual(saved.data["product_name"], product.product_name)
+        self.assertEqual(
+            saved.data["nutrition_grades"], product.nutrition_grades
+        )
+
     def test_cannot_save_without_loggin(self):
         product_id = Product.objects.order_by('?').first().id
         self.client.post(
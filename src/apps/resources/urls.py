@@ -14,6 +14,26 @@ urlpatterns = [
         views.SearchProductView.as_view(),
         name="products_search"
     ),
+    path(
+        "products/autocomplete/",
+        views.AutocompleteView.as_view(),
+        name="products_autocomplete"
+    ),
+    path(
+        "api/products/search/",
+        views.SearchProductApiView.as_view(),
+        name="products_search_api"
+    ),
+    path(
+        "api/products/substitutes/",
+        views.SubstitutesApiView.as_view(),
+        name="products_substitutes_api"
+    ),
+    path(
+        "api/products/cache/",
+        views.ProductCacheStatsView.as_view(),
+        name="products_cache_stats"
+    ),
     path(
         "products/saved/",
         views.SavedProductsListView.as_view(),
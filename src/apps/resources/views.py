@@ -1,36 +1,176 @@
-import requests
-
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
+from django.contrib.auth.mixins import (
+    LoginRequiredMixin, UserPassesTestMixin
+)
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import redirect, render
+from django.urls import reverse
 from django.views.generic import DetailView, ListView, View
 
-from .constants import PRODUCTS_URL
-from .models import Category, BackupProduct, Product
+from .autocomplete import autocomplete, normalize
+from .constants import (
+    AUTOCOMPLETE_MIN_LENGTH, SEARCH_MAX_PAGE_SIZE, SEARCH_PAGE_SIZE,
+    SUBSTITUTES_BULK_MAX
+)
+from .external import external_products
+from .models import BackupProduct, Product
+from .productcache import product_pages
+from .searchcache import search
+
+
+def product_json(product):
+    """
+    Get the fields of a product returned by the JSON views.
+    """
+    return {
+        "id": product.id,
+        "product_name": product.product_name,
+        "code": product.code,
+        "img_url": product.img_url,
+        "warehouse": product.warehouse,
+        "nutrition_grades": product.nutrition_grades,
+        "url": reverse("resources:products_list", args=[product.id])
+    }
+
+
+def search_page(request, size=SEARCH_PAGE_SIZE):
+    """
+    Get the page of search results asked by a request.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        Request with the searched `word` and the `cursor` of the page.
+    size : int
+        Number of products of the page.
+
+    Returns
+    -------
+    word, products, next_cursor : tuple
+        Searched words, products of the page and cursor of the next
+        page.
+
+    Raises
+    ------
+        ValueError : If the cursor is invalid.
+    """
+    word = request.GET.get("word", "").strip()
+    if not word:
+        return word, [], None
+    products, next_cursor = search(word, request.GET.get("cursor"), size)
+    return word, products, next_cursor
 
 
 class SearchProductView(View):
     """
-    Product page view.
+    Search results page view.
     """
+    template_name = "resources/search_results.html"
+
     def get(self, request, **kwargs):
         """
-        Override GET method to make a request to find the product.
-        """
-        word = request.GET.get("word", "")
-        if word:
-            # Get a product that starts with the given word if no product
-            # has been found take a product whose name contains the given
-            # word.
-            product = Product.objects.filter(
-                Q(product_name__startswith=word)
-                | Q(product_name__contains=word)
-            ).first()
-            if product:
-                return redirect("resources:products_list", pk=product.id)
-        return render(
-            request, "core/index.html", {"product_not_found": word}, status=301
-        )
+        Override GET method to show a page of the products found.
+        """
+        try:
+            word, products, next_cursor = search_page(request)
+        except ValueError:
+            return HttpResponseBadRequest("Curseur invalide.")
+        context = {
+            "word": word, "products": products, "next_cursor": next_cursor
+        }
+        return render(request, self.template_name, context)
+
+
+class SearchProductApiView(View):
+    """
+    Search results JSON view.
+    """
+    def get(self, request, **kwargs):
+        """
+        Override GET method to return a page of the products found,
+        the size of the page is bounded.
+        """
+        try:
+            size = int(request.GET.get("page_size", SEARCH_PAGE_SIZE))
+            size = min(max(size, 1), SEARCH_MAX_PAGE_SIZE)
+            word, products, next_cursor = search_page(request, size)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse({
+            "word": word,
+            "results": [product_json(p) for p in products],
+            "next": next_cursor
+        })
+
+
+class SubstitutesApiView(View):
+    """
+    Substitutes of several products JSON view.
+    """
+    def get(self, request, **kwargs):
+        """
+        Override GET method to return the substitutes of the products
+        whose identifiers are given in `ids`, separated by commas.
+        """
+        try:
+            ids = [int(pk) for pk in request.GET.get("ids", "").split(",")]
+        except ValueError:
+            return JsonResponse(
+                {"error": "Identifiants de produits invalides."}, status=400
+            )
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > SUBSTITUTES_BULK_MAX:
+            return JsonResponse(
+                {
+                    "error": f"Au plus {SUBSTITUTES_BULK_MAX} produits "
+                             f"par requête."
+                },
+                status=400
+            )
+        substitutes = Product.get_substitutes_bulk(ids)
+        return JsonResponse({
+            "results": [
+                {
+                    "id": pk,
+                    "substitutes": [product_json(p) for p in substitutes[pk]]
+                }
+                for pk in ids
+            ]
+        })
+
+
+class AutocompleteView(View):
+    """
+    Suggestions of products JSON view.
+    """
+    def get(self, request, **kwargs):
+        """
+        Override GET method to return the products whose name starts
+        with the typed text, from the index kept in memory.
+        """
+        q = request.GET.get("q", "")
+        results = []
+        if len(normalize(q)) >= AUTOCOMPLETE_MIN_LENGTH:
+            results = [
+                {"id": pk, "product_name": name}
+                for pk, name in autocomplete.complete(q)
+            ]
+        return JsonResponse({"q": q, "results": results})
+
+
+class ProductCacheStatsView(UserPassesTestMixin, View):
+    """
+    Metrics of the product pages cached by the process JSON view,
+    reserved to the staff.
+    """
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, **kwargs):
+        """
+        Override GET method to return the size and the hit rate of the
+        cache of the product pages.
+        """
+        return JsonResponse(product_pages.stats())
 
 
 class ShowProductView(DetailView):
@@ -41,12 +181,10 @@ class ShowProductView(DetailView):
         """
         Override GET method to make a request to find some substitutes.
         """
-        # Get a list of better products than the one shown.
-        pk = kwargs.get("pk")
-        substitutes = self.model.get_substitutes(pk)
-        context = {
-            "product": Product.objects.get(pk=pk), "substitutes": substitutes
-        }
+        # Get the product and a list of better products, from the
+        # memory of the process when the page was already shown.
+        page = product_pages.get(kwargs.get("pk"))
+        context = {"product": page.product, "substitutes": page.substitutes}
         return render(request, self.template_name, context)
 
 
@@ -60,55 +198,29 @@ class SavedProductsListView(LoginRequiredMixin, ListView):
         """
         Override get_queryset method to show all the product saved by
         the current user.
-        to show the real product from the product
-        code, if the product is in the database show it directly
-        otherwise make an API call to retrieve the product, otherwise
-        do not show it in the list of saved products.
+        The products are shown from the snapshot taken when they were
+        saved, so the list is read from the saved products alone. The
+        products saved without a snapshot are retrieved from the API
+        at the same time and their snapshot is kept, otherwise they
+        aren't shown in the list of saved products.
         """
-        current_user = self.request.user
-        queryset = BackupProduct.objects.filter(user=current_user)
-        object_list = []
-        for p in queryset:
-            try:
-                product = Product.objects.get(
-                    code=p.product_code,
-                    category=Category.objects.get(name=p.category_name)
+        saved_products = list(
+            BackupProduct.saved_products(self.request.user)
+        )
+        missing = [saved for saved in saved_products if not saved.snapshot]
+        if missing:
+            external = external_products(
+                saved.product_code for saved in missing
+            )
+            found = [
+                saved for saved in missing if saved.product_code in external
+            ]
+            for saved in found:
+                saved.snapshot = BackupProduct.snapshot_of(
+                    external[saved.product_code]
                 )
-                object_list.append({
-                    "id": product.id,
-                    "product_name": product.product_name,
-                    "code": p.product_code,
-                    "img_url": product.img_url,
-                    "url": product.url,
-                    "salt": product.salt,
-                    "fat": product.fat,
-                    "sugars": product.sugars,
-                    "saturated_fat": product.saturated_fat,
-                    "warehouse": product.warehouse,
-                    "allergens": product.allergens,
-                    "nutrition_grades": product.nutrition_grades
-                })
-            except Exception as e:
-                print("Error =>", e)
-                response = requests.get(f"{PRODUCTS_URL}{p.product_code}.json")
-                if response.status_code == 200:
-                    r_json = response.json()["product"]
-                    object_list.append({
-                        "id": "NID",
-                        "product_name": r_json.get("product_name"),
-                        "code": p.product_code,
-                        "img_url": r_json.get("image_url"),
-                        "url": r_json.get("url"),
-                        "salt": r_json["nutrient_levels"].get("salt"),
-                        "fat": r_json["nutrient_levels"].get("fat"),
-                        "sugars": r_json["nutrient_levels"].get("sugars"),
-                        "saturated_fat": r_json["nutrient_levels"].get("saturated-fat"),
-                        "warehouse": r_json.get("brands"),
-                        "allergens": r_json.get("allergens"),
-                        "nutrition_grades": r_json.get("nutrition_grades")
-                    })
-
-        return object_list
+            BackupProduct.objects.bulk_update(found, ["snapshot"])
+        return [saved for saved in saved_products if saved.snapshot]
 
 
 class SaveProductView(LoginRequiredMixin, View):
@@ -134,7 +246,9 @@ class SaveProductView(LoginRequiredMixin, View):
             bp = BackupProduct.objects.create(
                 product_code=product.code,
                 user=current_user,
-                category_name=product.category.name
+                category_name=product.category.name,
+                product=product,
+                snapshot=BackupProduct.snapshot_of(product)
             )
             bp.save()
         return redirect(
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # External apps
 
     # Custom Apps
@@ -67,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.resources.context_processors.autocomplete',
             ],
         },
     },
@@ -136,6 +138,50 @@ LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/login/'
 
 
+# Open Food Facts, a local stand-in can be served by the
+# fake_openfoodfacts command.
+OPENFOODFACTS_URL = os.environ.get(
+    "OPENFOODFACTS_URL", "https://fr.openfoodfacts.org"
+)
+
+# Search of products by trigram similarity: "fallback" when the
+# full-text search finds nothing, "always" or "off".
+SEARCH_FUZZY = "fallback"
+
+# Substitutes of the products read from the database ("database") or
+# from arrays kept in the memory of each process ("memory").
+SUBSTITUTES_ENGINE = "database"
+
+# Cache of the search results, kept in the memory of each process by
+# default. CACHE_URL shares it between the processes: a redis:// url
+# (requires django-redis) or the directory of a file cache.
+CACHE_URL = os.environ.get("CACHE_URL", "")
+if CACHE_URL.startswith("redis://"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+elif CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Size of the catalogue synchronised from Open Food Facts
+SYNC_MAX_CATEGORIES = 20
+SYNC_MAX_PRODUCTS = 200
+
+
 # Specifics settings for Sentry
 sentry_sdk.init(
     dsn=get_env_variable("SENTRY_DNS"),
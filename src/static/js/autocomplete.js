@@ -0,0 +1,27 @@
+(function($) {
+  "use strict";
+
+  // Suggest the names of the products while the user types.
+  var timer = null;
+  var suggestions = $("#products-autocomplete");
+
+  $("input[data-autocomplete]").on("input", function() {
+    var input = $(this);
+    clearTimeout(timer);
+    // Same minimum length as the server.
+    if (input.val().trim().length < input.data("autocomplete-min-length")) {
+      suggestions.empty();
+      return;
+    }
+    // Wait for the user to stop typing.
+    timer = setTimeout(function() {
+      $.getJSON(input.data("autocomplete"), {q: input.val()}, function(data) {
+        suggestions.empty();
+        $.each(data.results, function(_, product) {
+          suggestions.append($("<option>").attr("value", product.product_name));
+        });
+      });
+    }, 150);
+  });
+
+})(jQuery);